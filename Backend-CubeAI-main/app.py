@@ -1,12 +1,18 @@
 from flask import Flask
 from flask_cors import CORS
-from routes import user_routes, generation_routes
+from routes import user_routes, generation_routes, metrics_routes, socket_events
+from config.socketio_config import socketio
+from utils import input_staging
 
 app = Flask(__name__)
 CORS(app)
 
 app.register_blueprint(user_routes.bp)
 app.register_blueprint(generation_routes.bp)
+app.register_blueprint(metrics_routes.bp)
+
+socketio.init_app(app)
+input_staging.ensure_expiry_rule()
 
 if __name__ == "__main__":
-    app.run(debug=True, port=8080)
\ No newline at end of file
+    socketio.run(app, debug=True, port=8080)
\ No newline at end of file
@@ -16,6 +16,17 @@ celery = Celery(
 # Le dice a Celery que busque tareas automáticamente en el módulo 'tasks'
 celery.autodiscover_tasks(['tasks']) 
 
+# Colas de la generación: 'remote_gpu' para las llamadas a los Spaces y la subida de sus
+# salidas a Storage (desde el nodo que las tiene en disco) e 'io' para
+# las escrituras en Firestore. Cada cola se escala con su propio worker.
+GPU_QUEUE = os.getenv('CELERY_GPU_QUEUE', 'remote_gpu')
+IO_QUEUE = os.getenv('CELERY_IO_QUEUE', 'io')
+
 celery.conf.update(
     task_track_started=True,
+    task_default_queue=IO_QUEUE,
+    task_routes={
+        'tasks.run_space_stage': {'queue': GPU_QUEUE},
+        'tasks.run_persist_stage': {'queue': IO_QUEUE},
+    },
 )
\ No newline at end of file
@@ -1,9 +1,18 @@
 from dotenv import load_dotenv
+from contextlib import contextmanager
 import os
+import threading
+import time
+import httpx
 import gradio_client
 
 load_dotenv()
 
+HF_CLIENT_POOL_SIZE = int(os.getenv("HF_CLIENT_POOL_SIZE", "4"))
+HF_CLIENT_IDLE_TIMEOUT = float(os.getenv("HF_CLIENT_IDLE_TIMEOUT", "600"))
+HF_CLIENT_HEALTHCHECK_INTERVAL = float(os.getenv("HF_CLIENT_HEALTHCHECK_INTERVAL", "60"))
+HF_CLIENT_LEASE_TIMEOUT = float(os.getenv("HF_CLIENT_LEASE_TIMEOUT", "300"))
+
 def create_hf_client(url):
     try:
         return gradio_client.Client(
@@ -12,4 +21,269 @@ def create_hf_client(url):
         )
     except Exception as e:
         print(f"Error al crear cliente HF para {url}: {e}")
-        raise
\ No newline at end of file
+        raise
+
+class _PooledClient:
+    """Cliente de Gradio junto con los metadatos que el pool necesita para gestionarlo."""
+    def __init__(self, client):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+
+class HFClientPool:
+    """
+    Pool de clientes de Gradio para un mismo Space.
+    Cada lease entrega un cliente en exclusiva, de modo que cada trabajo tiene su propia
+    sesión (/start_session ... /end_session) aunque varios hilos del worker usen el mismo Space.
+    """
+    def __init__(self, url: str, size: int = HF_CLIENT_POOL_SIZE,
+                 idle_timeout: float = HF_CLIENT_IDLE_TIMEOUT,
+                 healthcheck_interval: float = HF_CLIENT_HEALTHCHECK_INTERVAL):
+        if not url:
+            raise ValueError("La URL del Space es requerida para crear el pool de clientes.")
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1.")
+        self.url = url
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = []
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+    def _is_healthy(self, pooled: _PooledClient) -> bool:
+        """Comprueba que el Space sigue respondiendo con la configuración del cliente."""
+        if time.monotonic() - pooled.last_checked < self.healthcheck_interval:
+            return True
+        try:
+            response = httpx.get(
+                f"{pooled.client.src.rstrip('/')}/config",
+                headers=pooled.client.headers,
+                timeout=10,
+            )
+            healthy = response.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        pooled.last_checked = time.monotonic()
+        return healthy
+
+    def _evict_idle(self):
+        """Descarta los clientes que llevan más de idle_timeout sin usarse. Requiere el lock."""
+        now = time.monotonic()
+        self._idle = [p for p in self._idle if now - p.last_used < self.idle_timeout]
+
+    def acquire(self, timeout: float = HF_CLIENT_LEASE_TIMEOUT):
+        """Obtiene un cliente del pool, creando uno nuevo si hay capacidad disponible."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.size:
+                    pooled = None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No hay clientes disponibles para {self.url} tras {timeout} segundos.")
+                self._condition.wait(remaining)
+
+        try:
+            if pooled is not None and not self._is_healthy(pooled):
+                pooled = None
+            if pooled is None:
+                pooled = _PooledClient(create_hf_client(self.url))
+        except Exception:
+            self._release_slot()
+            raise
+        return pooled
+
+    def release(self, pooled: _PooledClient, discard: bool = False):
+        """Devuelve un cliente al pool. Si discard es True, el cliente se descarta."""
+        if not discard:
+            try:
+                # Nueva sesión para el siguiente trabajo que use este cliente.
+                pooled.client.reset_session()
+            except Exception as e:
+                print(f"Error al reiniciar la sesión del cliente HF para {self.url}: {e}")
+                discard = True
+        with self._condition:
+            self._in_use -= 1
+            if not discard:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    def _release_slot(self):
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self, timeout: float = HF_CLIENT_LEASE_TIMEOUT):
+        """
+        Context manager que presta un cliente durante un trabajo completo.
+        Si el trabajo falla, el cliente se descarta para no reutilizar una sesión en mal estado.
+        """
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled.client
+        except BaseException:
+            self.release(pooled, discard=True)
+            raise
+        else:
+            self.release(pooled)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {"url": self.url, "size": self.size, "in_use": self._in_use, "idle": len(self._idle)}
+
+@contextmanager
+def download_dir(client, directory):
+    """
+    Dirige al directorio indicado los archivos de salida que descarga un cliente prestado en
+    exclusiva (p. ej. el espacio de trabajo del job) y restaura el destino al terminar.
+    Con directory=None el cliente no descarga nada y devuelve las salidas con su URL en el Space.
+    """
+    # gradio_client >= 1.0 guarda el destino en 'download_files' (False si no descarga); las
+    # versiones anteriores tienen 'download_files' booleano y el destino en 'output_dir'.
+    download_files = getattr(client, "download_files", True)
+    if download_files is False:
+        yield client
+        return
+    if directory is None:
+        attribute, value = "download_files", False
+    else:
+        attribute, value = ("output_dir" if download_files is True else "download_files"), directory
+    previous = getattr(client, attribute, None)
+    setattr(client, attribute, value)
+    try:
+        yield client
+    finally:
+        setattr(client, attribute, previous)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_client_pool(url: str) -> HFClientPool:
+    """Devuelve el pool compartido (uno por proceso) para la URL del Space."""
+    with _pools_lock:
+        pool = _pools.get(url)
+        if pool is None:
+            pool = HFClientPool(url)
+            _pools[url] = pool
+        return pool
+
+SPACE_ROUTER_LATENCY_ALPHA = float(os.getenv("SPACE_ROUTER_LATENCY_ALPHA", "0.3"))
+SPACE_ROUTER_ERROR_ALPHA = float(os.getenv("SPACE_ROUTER_ERROR_ALPHA", "0.3"))
+SPACE_ROUTER_MAX_FAILURES = int(os.getenv("SPACE_ROUTER_MAX_FAILURES", "3"))
+SPACE_ROUTER_COOLDOWN = float(os.getenv("SPACE_ROUTER_COOLDOWN", "300"))
+
+def parse_space_urls(value: str) -> list:
+    """Convierte una variable de entorno con una o varias URLs separadas por comas en una lista."""
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+class _ReplicaStats:
+    """Métricas recientes de una réplica (por proceso)."""
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+class SpaceRouter:
+    """
+    Reparte las sesiones de un tipo de generación entre réplicas equivalentes de un Space.
+    Cada réplica tiene su propio pool de clientes; el router las ordena por latencia reciente,
+    tasa de error y plazas libres, y aparta durante un tiempo las que fallan seguidas.
+    """
+    def __init__(self, urls: list):
+        if not urls:
+            raise ValueError("Se requiere al menos una URL de Space para crear el router.")
+        self.urls = list(dict.fromkeys(urls))
+        self.pools = {url: get_client_pool(url) for url in self.urls}
+        self._stats = {url: _ReplicaStats() for url in self.urls}
+        self._lock = threading.Lock()
+
+    @property
+    def primary_url(self) -> str:
+        """URL que identifica al grupo de réplicas (p. ej. en la clave de la caché de resultados)."""
+        return self.urls[0]
+
+    def is_healthy(self, url: str) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._stats[url].unhealthy_until
+
+    def ranked(self, free_slots=None) -> list:
+        """
+        Devuelve las réplicas de mejor a peor. Las sanas van primero y, entre ellas, las que
+        tienen plazas libres; después se ordenan por latencia penalizada por la tasa de error.
+        Las réplicas sin historial se prueban antes que las conocidas.
+        Args:
+            free_slots (callable): URL -> plazas libres entre todos los workers (opcional).
+        """
+        now = time.monotonic()
+        with self._lock:
+            snapshot = {url: (stats.unhealthy_until, stats.latency, stats.error_rate)
+                        for url, stats in self._stats.items()}
+
+        def sort_key(url):
+            unhealthy_until, latency, error_rate = snapshot[url]
+            available = free_slots(url) if free_slots else self.pools[url].size - self.pools[url].stats()["in_use"]
+            score = (latency or 0.0) * (1 + 4 * error_rate)
+            return (unhealthy_until > now, available <= 0, score)
+
+        return sorted(self.urls, key=sort_key)
+
+    def record_success(self, url: str, elapsed: float):
+        with self._lock:
+            stats = self._stats[url]
+            stats.latency = elapsed if stats.latency is None else (
+                SPACE_ROUTER_LATENCY_ALPHA * elapsed + (1 - SPACE_ROUTER_LATENCY_ALPHA) * stats.latency)
+            stats.error_rate *= (1 - SPACE_ROUTER_ERROR_ALPHA)
+            stats.consecutive_failures = 0
+            stats.unhealthy_until = 0.0
+
+    def record_failure(self, url: str, unhealthy: bool = False):
+        """Registra un fallo. Con unhealthy=True (cuota agotada, Space dormido...) la réplica se aparta ya."""
+        with self._lock:
+            stats = self._stats[url]
+            stats.error_rate = SPACE_ROUTER_ERROR_ALPHA + (1 - SPACE_ROUTER_ERROR_ALPHA) * stats.error_rate
+            stats.consecutive_failures += 1
+            if unhealthy or stats.consecutive_failures >= SPACE_ROUTER_MAX_FAILURES:
+                stats.unhealthy_until = time.monotonic() + SPACE_ROUTER_COOLDOWN
+                print(f"Réplica {url} marcada como no disponible durante {SPACE_ROUTER_COOLDOWN} segundos.")
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                url: {
+                    "latency": stats.latency,
+                    "error_rate": stats.error_rate,
+                    "healthy": now >= stats.unhealthy_until,
+                    "pool": self.pools[url].stats(),
+                }
+                for url, stats in self._stats.items()
+            }
+
+_routers = {}
+
+def get_space_router(urls_value: str) -> SpaceRouter:
+    """
+    Devuelve el router compartido (uno por proceso) para una lista de réplicas.
+    Args:
+        urls_value (str): Una URL o varias separadas por comas, tal como vienen del entorno.
+    """
+    urls = parse_space_urls(urls_value)
+    key = tuple(urls)
+    with _pools_lock:
+        router = _routers.get(key)
+    if router is None:
+        router = SpaceRouter(urls)
+        with _pools_lock:
+            router = _routers.setdefault(key, router)
+    return router
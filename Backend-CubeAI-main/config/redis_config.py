@@ -0,0 +1,11 @@
+from dotenv import load_dotenv
+import os
+import redis
+
+load_dotenv()
+
+# Conexión compartida con Redis (el mismo servidor que usa Celery como broker y backend).
+redis_client = redis.Redis.from_url(os.getenv('REDIS_URL'), decode_responses=True)
+
+# Misma conexión sin decodificar, para valores binarios (p. ej. las entradas en el staging).
+redis_binary_client = redis.Redis.from_url(os.getenv('REDIS_URL'))
@@ -0,0 +1,24 @@
+from dotenv import load_dotenv
+from flask_socketio import SocketIO
+import os
+
+load_dotenv()
+
+# Canal push del progreso de las generaciones. Los eventos viajan por Redis pub/sub, de modo
+# que cualquier proceso (los workers de gunicorn o los de Celery) puede emitir a cualquier cliente.
+# Con varios workers de gunicorn el cliente debe usar solo el transporte websocket (sin sesiones fijas),
+# que en modo 'threading' requiere el paquete simple-websocket.
+socketio = SocketIO(
+    cors_allowed_origins="*",
+    message_queue=os.getenv('REDIS_URL'),
+    async_mode="threading",
+)
+
+# Emisor para procesos sin servidor Socket.IO (workers de Celery): solo publica en Redis.
+_emitter = None
+
+def get_emitter() -> SocketIO:
+    global _emitter
+    if _emitter is None:
+        _emitter = SocketIO(message_queue=os.getenv('REDIS_URL'))
+    return _emitter
@@ -0,0 +1,25 @@
+import os
+
+# Lado mayor (px) al que se reducen las imágenes de entrada de cada servicio: la resolución con la
+# que trabaja su Space, de modo que no se envían píxeles que el Space va a descartar.
+#   TRELLIS (Imagen3D, MultiImagen3D y Boceto3D) limita la entrada a 1024 px antes de recortar
+#   el objeto, así que por debajo de ese tamaño se perdería detalle del recorte.
+#   Unique3D (Unico3D) genera sus vistas a partir de la imagen frontal a 512 px.
+# Cada valor se puede ajustar con INPUT_IMAGE_MAX_SIDE_{COLECCIÓN} (p. ej. INPUT_IMAGE_MAX_SIDE_UNICO3D)
+# y el resto de servicios usan INPUT_IMAGE_MAX_SIDE. Texto3D y TextoImagen3D no reciben imágenes:
+# TextoImagen3D genera la suya dentro del Space.
+DEFAULT_INPUT_MAX_SIDE = int(os.getenv("INPUT_IMAGE_MAX_SIDE", "1024"))
+
+SPACE_INPUT_MAX_SIDE = {
+    "Imagen3D": 1024,
+    "MultiImagen3D": 1024,
+    "Boceto3D": 1024,
+    "Unico3D": 512,
+}
+
+def input_max_side(collection_name: str) -> int:
+    """Lado mayor de las entradas del servicio de la colección indicada."""
+    override = os.getenv(f"INPUT_IMAGE_MAX_SIDE_{collection_name.upper()}")
+    if override:
+        return int(override)
+    return SPACE_INPUT_MAX_SIDE.get(collection_name, DEFAULT_INPUT_MAX_SIDE)
@@ -1,6 +1,84 @@
 from firebase_admin import auth
 from flask import request, jsonify
 from functools import wraps
+from collections import OrderedDict
+from config.redis_config import redis_client
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+# Caché de tokens ya verificados: evita repetir la verificación criptográfica del mismo token
+# en cada petición (p. ej. los sondeos de estado). Cada entrada caduca con el 'exp' del token.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+# Segundo nivel opcional en Redis, compartido entre los workers de gunicorn.
+TOKEN_CACHE_REDIS = os.getenv("TOKEN_CACHE_REDIS", "false").lower() == "true"
+# Token para servicios internos (p. ej. el scraper de /metrics), en la cabecera X-Internal-Token.
+# Vacío lo desactiva y solo entran los usuarios con el claim 'admin'.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
+_REDIS_PREFIX = "auth-token:"
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+def _token_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+def _cache_get(key: str):
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            decoded_token, expires_at = entry
+            if expires_at > now:
+                _token_cache.move_to_end(key)
+                return decoded_token
+            del _token_cache[key]
+
+    if TOKEN_CACHE_REDIS:
+        try:
+            data = redis_client.get(_REDIS_PREFIX + key)
+        except Exception as e:
+            print(f"Error al leer la caché de tokens en Redis: {e}")
+            return None
+        if data:
+            decoded_token = json.loads(data)
+            _cache_put(key, decoded_token, shared=False)
+            return decoded_token
+    return None
+
+def _cache_put(key: str, decoded_token: dict, shared: bool = True):
+    expires_at = decoded_token.get("exp", 0)
+    ttl = int(expires_at - time.time())
+    if ttl <= 0:
+        return
+    with _token_cache_lock:
+        _token_cache[key] = (decoded_token, expires_at)
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+    if shared and TOKEN_CACHE_REDIS:
+        try:
+            redis_client.set(_REDIS_PREFIX + key, json.dumps(decoded_token), ex=ttl)
+        except Exception as e:
+            print(f"Error al guardar el token en la caché de Redis: {e}")
+
+def verify_token(id_token: str) -> dict:
+    """
+    Verifica un ID token de Firebase, reutilizando el resultado mientras el token no caduque.
+    Raises:
+        Exception: La de firebase_admin si el token no es válido.
+    """
+    key = _token_key(id_token)
+    decoded_token = _cache_get(key)
+    if decoded_token is None:
+        decoded_token = auth.verify_id_token(id_token)
+        _cache_put(key, decoded_token)
+    return decoded_token
 
 def verify_token_middleware(f):
     @wraps(f)
@@ -11,10 +89,33 @@ def verify_token_middleware(f):
 
         id_token = auth_header.split(" ")[1]
         try:
-            decoded_token = auth.verify_id_token(id_token)
+            decoded_token = verify_token(id_token)
             request.user = decoded_token
         except Exception as e:
             return jsonify({"error": f"Token verification failed: {str(e)}"}), 403
 
         return f(*args, **kwargs)
-    return decorator
\ No newline at end of file
+    return decorator
+
+def verify_admin_middleware(f):
+    """Solo administradores (custom claim 'admin' en el token de Firebase) o servicios internos con INTERNAL_API_TOKEN."""
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        internal_token = request.headers.get('X-Internal-Token')
+        if INTERNAL_API_TOKEN and internal_token and hmac.compare_digest(internal_token, INTERNAL_API_TOKEN):
+            return f(*args, **kwargs)
+
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return jsonify({"error": "Authorization header missing or invalid"}), 403
+
+        try:
+            decoded_token = verify_token(auth_header.split(" ")[1])
+        except Exception as e:
+            return jsonify({"error": f"Token verification failed: {str(e)}"}), 403
+        if decoded_token.get("admin") is not True:
+            return jsonify({"error": "Se requieren permisos de administrador"}), 403
+        request.user = decoded_token
+
+        return f(*args, **kwargs)
+    return decorator
@@ -6,31 +6,61 @@ from services.textimg3d_service import textimg3d_service
 from services.unico3d_service import unico3d_service
 from services.multiimg3d_service import multiimg3d_service
 from services.boceto3d_service import boceto3d_service
+from services import generation_feed, generation_summary
+from services.base_generation_service import STATE_PREPROCESSED, STATE_SAMPLED_3D, STATE_GLB_EXTRACTED, STATE_UPLOADED, CARD_FIELDS
 
 from celery_app import celery # Import Celery app
 from celery.result import AsyncResult # Import AsyncResult
+from celery import uuid
 
-# Import existing and new Celery tasks
-from tasks import run_text3d_generation
-from tasks import run_img3d_generation, run_textimg3d_generation, run_unico3d_generation, run_multiimg3d_generation, run_boceto3d_generation
+from tasks import dispatch_generation, resume_generation, bulk_delete_generations
+from utils.hashing import digest_json
+from utils import input_uploads, input_staging, task_owners
 
-import os
-import tempfile
-import werkzeug.utils
 
 bp = Blueprint('generation', __name__)
 
-def save_temp_file(file_storage):
-    if not file_storage:
-        return None
-    filename = werkzeug.utils.secure_filename(file_storage.filename)
-    if not filename:
-        filename = "uploaded_file"
-
-    temp_dir = tempfile.mkdtemp()
-    temp_file_path = os.path.join(temp_dir, filename)
-    file_storage.save(temp_file_path)
-    return temp_file_path
+def request_fields():
+    """Campos de la petición: formulario multipart o, con subida directa al bucket, cuerpo JSON."""
+    if request.files or request.form:
+        return request.form
+    return request.get_json(silent=True) or {}
+
+def _direct_uploads():
+    uploads = (request.get_json(silent=True) or {}).get("uploads")
+    return uploads if isinstance(uploads, dict) else {}
+
+def has_input_file(field):
+    return bool(request.files.get(field)) or bool(_direct_uploads().get(field))
+
+def resolve_input_file(user_uid, field):
+    """
+    Entrada de archivo de la generación: el archivo multipart se guarda en el staging compartido
+    (referencia 'staged:{sha256}') y la subida directa ('uploads': {campo: object_name}) se valida
+    y se pasa como referencia 'gs://'. Así los workers no dependen del disco del nodo web.
+    Raises:
+        ValueError: Si la subida directa no es válida.
+    """
+    object_name = _direct_uploads().get(field)
+    if object_name:
+        return input_uploads.resolve_upload(user_uid, object_name)
+    return input_staging.stage_upload(request.files.get(field))
+
+def submit_generation(service, user_uid, generation_name, inputs):
+    """
+    Encola la generación o, si ya hay una idéntica en curso, devuelve su task_id.
+    Las entradas en el staging de una petición duplicada comparten clave con las de la original;
+    sus subidas directas, en cambio, son objetos propios y se borran si la petición no se encola.
+    """
+    try:
+        task_id, created = dispatch_generation(service, user_uid, generation_name, inputs)
+    except Exception:
+        input_uploads.discard_uploads(inputs)
+        raise
+    if not created:
+        input_uploads.discard_uploads(inputs)
+        current_app.logger.info(f"Petición duplicada de '{generation_name}': se reutiliza la tarea {task_id}")
+    return task_id
 
 SERVICE_MAP = {
     "Imagen3D": img3d_service,
@@ -55,23 +85,19 @@ READABLE_TO_API_TYPE_MAP = {
 def predict_generation():
     try:
         user_uid = request.user["uid"]
-        image_file = request.files.get("image")
-        generation_name = request.form.get("generationName")
+        generation_name = request_fields().get("generationName")
 
-        if not image_file:
+        if not has_input_file("image"):
             return jsonify({"error": "Falta el archivo de imagen."}), 400
         if not generation_name:
             return jsonify({"error": "Falta el nombre de la generación."}), 400
 
-        temp_file_path = save_temp_file(image_file)
-        if not temp_file_path:
-             return jsonify({"error": "No se pudo guardar el archivo temporal."}), 500
-
-        task = run_img3d_generation.delay(user_uid, temp_file_path, generation_name)
+        image_path = resolve_input_file(user_uid, "image")
+        task_id = submit_generation(img3d_service, user_uid, generation_name, {"image_path": image_path})
 
         return jsonify({
             "message": "La generación de Imagen a 3D ha comenzado.",
-            "task_id": task.id
+            "task_id": task_id
         }), 202
 
     except ValueError as ve:
@@ -96,10 +122,12 @@ def create_text3d():
 
         # ----> INICIO DEL CAMBIO <----
 
-        # 1. En lugar de ejecutar la función directamente, la llamamos con .delay()
-        # .delay() le pasa la tarea a Celery y devuelve el control inmediatamente.
-        task = run_text3d_generation.delay(
-            user_uid, generation_name, user_prompt, selected_style
+        # 1. En lugar de ejecutar la función directamente, encolamos la cadena de etapas.
+        # submit_generation le pasa el trabajo a Celery y devuelve el control inmediatamente.
+        # Si el mismo usuario ya envió esta generación y sigue en curso, se reutiliza su task_id.
+        task_id = submit_generation(
+            text3d_service, user_uid, generation_name,
+            {"user_prompt": user_prompt, "selected_style": selected_style}
         )
         
         # 2. Respondemos al frontend con el ID de la tarea.
@@ -107,16 +135,14 @@ def create_text3d():
         #    El código 202 'Accepted' es el estándar para este tipo de respuesta.
         return jsonify({
             "message": "La generación ha comenzado. Te notificaremos cuando esté lista.",
-            "task_id": task.id
+            "task_id": task_id
         }), 202
 
         # ----> FIN DEL CAMBIO <----
 
     except ValueError as ve:
-        # Los errores de validación (como nombre duplicado) se deben manejar aquí,
-        # porque ocurren ANTES de que la tarea sea enviada.
-        # Los errores de validación (como nombre duplicado) se deben manejar aquí si ocurren ANTES de que la tarea sea enviada.
-        # Si _generation_exists es llamado dentro del servicio (y por ende, la tarea), este bloque no lo capturará.
+        # Los errores de validación (como nombre duplicado) se manejan aquí: el nombre
+        # se reserva en Firestore ANTES de enviar la tarea, así que falla de inmediato.
         current_app.logger.warning(f"Error de valor en /texto3D: {ve}") # Catches pre-task submission errors
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
@@ -136,11 +162,15 @@ def create_textimg3d():
         if not all([generation_name, subject, style, additional_details]):
             return jsonify({"error": "Faltan campos requeridos"}), 400
 
-        task = run_textimg3d_generation.delay(user_uid, generation_name, subject, style, additional_details)
+        task_id = submit_generation(textimg3d_service, user_uid, generation_name, {
+            "subject": subject,
+            "style": style,
+            "additional_details": additional_details,
+        })
 
         return jsonify({
             "message": "La generación de Texto+Imagen a 3D ha comenzado.",
-            "task_id": task.id
+            "task_id": task_id
         }), 202
     except ValueError as ve:
         current_app.logger.warning(f"Error de valor en /textimg3D: {ve}") # Catches pre-task submission errors
@@ -154,23 +184,19 @@ def create_textimg3d():
 def predict_unico3d():
     try:
         user_uid = request.user["uid"]
-        image_file = request.files.get("image")
-        generation_name = request.form.get("generationName")
+        generation_name = request_fields().get("generationName")
 
-        if not image_file:
+        if not has_input_file("image"):
             return jsonify({"error": "Falta el archivo de imagen."}), 400
         if not generation_name:
             return jsonify({"error": "Falta el nombre de la generación."}), 400
 
-        temp_file_path = save_temp_file(image_file)
-        if not temp_file_path:
-             return jsonify({"error": "No se pudo guardar el archivo temporal."}), 500
-
-        task = run_unico3d_generation.delay(user_uid, temp_file_path, generation_name)
+        image_path = resolve_input_file(user_uid, "image")
+        task_id = submit_generation(unico3d_service, user_uid, generation_name, {"image_path": image_path})
 
         return jsonify({
             "message": "La generación de Unico3D ha comenzado.",
-            "task_id": task.id
+            "task_id": task_id
         }), 202
     except ValueError as ve:
         current_app.logger.warning(f"Error de valor en /unico3D: {ve}") # Catches pre-task submission errors
@@ -184,35 +210,26 @@ def predict_unico3d():
 def predict_multi_image_3d():
     try:
         user_uid = request.user["uid"]
-        frontal_image_file = request.files.get("frontal")
-        lateral_image_file = request.files.get("lateral")
-        trasera_image_file = request.files.get("trasera")
-        generation_name = request.form.get("generationName")
+        generation_name = request_fields().get("generationName")
 
-        if not frontal_image_file or not lateral_image_file or not trasera_image_file:
+        if not all(has_input_file(field) for field in ("frontal", "lateral", "trasera")):
             return jsonify({"error": "Por favor, cargue las tres imágenes (frontal, lateral y trasera)."}), 400
         if not generation_name:
             return jsonify({"error": "Por favor, ingrese un nombre para la generación."}), 400
 
-        temp_frontal_path = save_temp_file(frontal_image_file)
-        temp_lateral_path = save_temp_file(lateral_image_file)
-        temp_trasera_path = save_temp_file(trasera_image_file)
-
-        if not all([temp_frontal_path, temp_lateral_path, temp_trasera_path]):
-            for p in [temp_frontal_path, temp_lateral_path, temp_trasera_path]:
-                if p and os.path.exists(p):
-                    os.remove(p)
-                    try: os.rmdir(os.path.dirname(p))
-                    except OSError: pass
-            return jsonify({"error": "No se pudieron guardar todos los archivos temporales."}), 500
+        frontal_image_path = resolve_input_file(user_uid, "frontal")
+        lateral_image_path = resolve_input_file(user_uid, "lateral")
+        trasera_image_path = resolve_input_file(user_uid, "trasera")
 
-        task = run_multiimg3d_generation.delay(
-            user_uid, temp_frontal_path, temp_lateral_path, temp_trasera_path, generation_name
-        )
+        task_id = submit_generation(multiimg3d_service, user_uid, generation_name, {
+            "frontal_image_path": frontal_image_path,
+            "lateral_image_path": lateral_image_path,
+            "trasera_image_path": trasera_image_path,
+        })
 
         return jsonify({
             "message": "La generación de Multi-Imagen a 3D ha comenzado.",
-            "task_id": task.id
+            "task_id": task_id
         }), 202
     except ValueError as ve:
         current_app.logger.warning(f"Error de valor en /multiimagen3D: {ve}") # Catches pre-task submission errors
@@ -226,24 +243,24 @@ def predict_multi_image_3d():
 def predict_boceto_3d():
     try:
         user_uid = request.user["uid"]
-        image_file = request.files.get("image")
-        generation_name = request.form.get("generationName")
-        description = request.form.get("description", "")
+        fields = request_fields()
+        generation_name = fields.get("generationName")
+        description = fields.get("description", "")
 
-        if not image_file:
+        if not has_input_file("image"):
             return jsonify({"error": "Por favor, cargue una imagen del boceto."}), 400
         if not generation_name:
             return jsonify({"error": "Por favor, ingrese un nombre para la generación."}), 400
 
-        temp_file_path = save_temp_file(image_file)
-        if not temp_file_path:
-             return jsonify({"error": "No se pudo guardar el archivo temporal."}), 500
-
-        task = run_boceto3d_generation.delay(user_uid, temp_file_path, generation_name, description)
+        image_path = resolve_input_file(user_uid, "image")
+        task_id = submit_generation(boceto3d_service, user_uid, generation_name, {
+            "image_path": image_path,
+            "description": description,
+        })
 
         return jsonify({
             "message": "La generación de Boceto a 3D ha comenzado.",
-            "task_id": task.id
+            "task_id": task_id
         }), 202
     except ValueError as ve:
         current_app.logger.warning(f"Error de valor en /boceto3D: {ve}") # Catches pre-task submission errors
@@ -252,38 +269,138 @@ def predict_boceto_3d():
         current_app.logger.error(f"Error inesperado en /boceto3D: {e}", exc_info=True)
         return jsonify({"error": "Error interno del servidor"}), 500
 
-@bp.route("/generation_status/<task_id>", methods=["GET"])
-def get_generation_status(task_id):
-    task_result = AsyncResult(task_id, app=celery)
+@bp.route("/generation/upload_urls", methods=["POST"])
+@verify_token_middleware
+def create_upload_urls():
+    """
+    URLs firmadas para subir las imágenes de entrada directamente al bucket. JSON:
+        {"content_types": ["image/png", ...]}
+    El cliente sube cada imagen con PUT (y las cabeceras devueltas) y envía la generación con
+    {"uploads": {"image": object_name}} en lugar del formulario multipart.
+    """
+    try:
+        content_types = (request.get_json(silent=True) or {}).get("content_types")
+        if not isinstance(content_types, list):
+            return jsonify({"error": "Se requiere la lista 'content_types'"}), 400
+        uploads = input_uploads.create_upload_urls(request.user["uid"], content_types)
+        return jsonify({"uploads": uploads, "expires_in": input_uploads.UPLOAD_URL_TTL}), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error al crear las URLs de subida: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
 
-    if task_result.state == 'PENDING':
+MAX_BATCH_STATUS_TASKS = 100
+MAX_GENERATIONS_PAGE_SIZE = 100
+# Hasta este número de generaciones (sin tipos completos) el borrado masivo se hace en la petición.
+BULK_DELETE_SYNC_LIMIT = 20
+
+# Estados propios que publican las etapas; sus metadatos (p. ej. preview_url) se devuelven tal cual.
+PROGRESS_STATES = (STATE_PREPROCESSED, STATE_SAMPLED_3D, STATE_GLB_EXTRACTED, STATE_UPLOADED)
+
+def _status_response(state, info, traceback=None):
+    """Respuesta de estado a partir del estado de Celery, su info (resultado, metadatos o excepción) y el traceback."""
+    if state == 'PENDING':
         response = {
             'status': 'PENDING',
             'message': 'Task is waiting to be processed.'
         }
-    elif task_result.state == 'STARTED':
+    elif state == 'QUEUED':
+        # La generación espera turno en la cola de admisión del Space.
+        response = {
+            'status': 'QUEUED',
+            'queue_position': (info or {}).get('queue_position'),
+            'message': 'Task is waiting for a free slot in the generation Space.'
+        }
+    elif state == 'PROCESSING':
+        # Etapa de la cadena en curso (space, upload o persist).
+        response = {
+            'status': 'PROCESSING',
+            'stage': (info or {}).get('stage'),
+            'message': 'Task is currently being processed.'
+        }
+    elif state in PROGRESS_STATES or state == 'DELETING':
+        response = dict(info or {}, status=state)
+    elif state == 'STARTED':
         response = {
             'status': 'IN_PROGRESS',
             'message': 'Task is currently being processed.'
         }
-    elif task_result.state == 'SUCCESS':
+    elif state == 'SUCCESS':
         response = {
             'status': 'SUCCESS',
-            'result': task_result.result # or task_result.get()
+            'result': info
         }
-    elif task_result.state == 'FAILURE':
+    elif state == 'FAILURE':
         response = {
             'status': 'FAILURE',
-            'message': str(task_result.info),  # .info contains the exception
-            'traceback': task_result.traceback # Optionally include traceback
+            'message': str(info),  # .info contains the exception
+            'traceback': traceback # Optionally include traceback
         }
     else:
         # For unknown states or if task_id is not found (though AsyncResult doesn't directly throw an error for unknown ID, state might be PENDING or a custom state)
         response = {
             'status': 'UNKNOWN',
-            'message': f'Task state is {task_result.state}. Or task ID not found.'
+            'message': f'Task state is {state}. Or task ID not found.'
         }
-    return jsonify(response)
+    return response
+
+def describe_task(task_id):
+    """Estado de una generación tal como lo ven el frontend y el canal push (Socket.IO)."""
+    task_result = AsyncResult(task_id, app=celery)
+    return _status_response(task_result.state, task_result.info, task_result.traceback)
+
+def describe_tasks(task_ids):
+    """
+    Estado de varias generaciones con una sola lectura (MGET) del backend de resultados de Celery,
+    en lugar de una consulta de AsyncResult por tarea.
+    """
+    backend = celery.backend
+    raw_metas = backend.client.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    statuses = {}
+    for task_id, raw_meta in zip(task_ids, raw_metas):
+        meta = backend.decode_result(raw_meta) if raw_meta else {"status": "PENDING", "result": None}
+        statuses[task_id] = _status_response(meta["status"], meta.get("result"), meta.get("traceback"))
+    return statuses
+
+@bp.route("/generation_status/<task_id>", methods=["GET"])
+@verify_token_middleware
+def get_generation_status(task_id):
+    # Las tareas de otros usuarios se tratan como inexistentes, sin revelar su estado.
+    if not task_owners.is_owner(task_id, request.user["uid"]):
+        return jsonify({"error": "La tarea no existe o no pertenece al usuario"}), 404
+    return jsonify(describe_task(task_id))
+
+@bp.route("/generation_status", methods=["POST"])
+@verify_token_middleware
+def get_generation_statuses():
+    """
+    Estado de varias tareas del usuario en una petición: JSON {"task_ids": [...]}.
+    Las tareas de otros usuarios (o desconocidas) se omiten de la respuesta.
+    La respuesta lleva un ETag; si el cliente lo envía en If-None-Match y ninguna tarea
+    ha cambiado, se responde 304 sin cuerpo.
+    """
+    data = request.get_json(silent=True) or {}
+    task_ids = data.get("task_ids")
+    if not isinstance(task_ids, list) or not all(isinstance(task_id, str) and task_id for task_id in task_ids):
+        return jsonify({"error": "Se requiere 'task_ids' como lista de identificadores"}), 400
+    task_ids = list(dict.fromkeys(task_ids))
+    if len(task_ids) > MAX_BATCH_STATUS_TASKS:
+        return jsonify({"error": f"Se admiten como máximo {MAX_BATCH_STATUS_TASKS} tareas por petición"}), 400
+
+    try:
+        task_ids = task_owners.owned_task_ids(task_ids, request.user["uid"])
+        statuses = describe_tasks(task_ids) if task_ids else {}
+    except Exception as e:
+        current_app.logger.error(f"Error al consultar el estado de las tareas: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+    etag = digest_json(statuses)
+    if request.if_none_match.contains(etag):
+        return "", 304
+    response = jsonify({"tasks": statuses})
+    response.set_etag(etag)
+    return response
 
 @bp.route("/generation/preview", methods=["POST"])
 @verify_token_middleware
@@ -307,6 +424,34 @@ def upload_generation_preview():
         current_app.logger.error(f"Error al subir la previsualización: {e}", exc_info=True)
         return jsonify({"error": "Error interno del servidor al subir la previsualización"}), 500
 
+@bp.route("/generation/resume", methods=["POST"])
+@verify_token_middleware
+def resume_failed_generation():
+    try:
+        user_uid = request.user["uid"]
+        generation_name = request.json.get("generation_name")
+        prediction_type_api = request.json.get("prediction_type_api")
+
+        if not generation_name or not prediction_type_api:
+            return jsonify({"error": "Faltan datos en la solicitud"}), 400
+        if prediction_type_api not in SERVICE_MAP:
+            return jsonify({"error": "Tipo de predicción no válido"}), 400
+
+        task_id = resume_generation(SERVICE_MAP[prediction_type_api], user_uid, generation_name)
+        if task_id is None:
+            return jsonify({"error": "No hay una generación pendiente que reanudar con ese nombre"}), 404
+
+        return jsonify({
+            "message": "La generación se ha reanudado desde la última etapa completada.",
+            "task_id": task_id
+        }), 202
+    except ValueError as ve:
+        current_app.logger.warning(f"Error de valor en /generation/resume: {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error al reanudar la generación: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
+
 @bp.route("/generations", methods=["GET"])
 @verify_token_middleware
 def get_user_generations():
@@ -314,16 +459,64 @@ def get_user_generations():
         user_uid = request.user["uid"]
         generation_type_api = request.args.get('type')
 
-        if generation_type_api in SERVICE_MAP:
-            service_instance = SERVICE_MAP[generation_type_api]
-            generations = service_instance.get_generations(user_uid)
-            return jsonify(generations), 200
-        else:
+        if generation_type_api not in SERVICE_MAP:
             return jsonify({"error": "Tipo de generación no válido"}), 400
+        service_instance = SERVICE_MAP[generation_type_api]
+
+        # view=card lee solo los campos de las tarjetas; limit/start_after paginan por fecha.
+        fields = CARD_FIELDS if request.args.get('view') == 'card' else None
+        limit = request.args.get('limit', type=int)
+        start_after = request.args.get('start_after')
+        if limit is not None and not 1 <= limit <= MAX_GENERATIONS_PAGE_SIZE:
+            return jsonify({"error": f"'limit' debe estar entre 1 y {MAX_GENERATIONS_PAGE_SIZE}"}), 400
+
+        generations = service_instance.get_generations(user_uid, limit=limit, start_after=start_after, fields=fields)
+        if limit is None:
+            return jsonify(generations), 200
+
+        next_cursor = generations[-1]["generation_name"] if len(generations) == limit else None
+        return jsonify({"items": generations, "next_cursor": next_cursor}), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         current_app.logger.error(f"Error al obtener generaciones: {e}", exc_info=True)
         return jsonify({"error": "Error interno del servidor"}), 500
 
+@bp.route("/generations/feed", methods=["GET"])
+@verify_token_middleware
+def get_user_generations_feed():
+    """Todas las generaciones del usuario (los seis tipos) en un único feed paginado por fecha."""
+    try:
+        user_uid = request.user["uid"]
+        fields = CARD_FIELDS if request.args.get('view') == 'card' else None
+        limit = request.args.get('limit', default=20, type=int)
+        if not 1 <= limit <= MAX_GENERATIONS_PAGE_SIZE:
+            return jsonify({"error": f"'limit' debe estar entre 1 y {MAX_GENERATIONS_PAGE_SIZE}"}), 400
+
+        feed = generation_feed.get_feed(
+            list(SERVICE_MAP.values()), user_uid, limit,
+            cursor=request.args.get('cursor'), fields=fields,
+        )
+        return jsonify(feed), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error al obtener el feed de generaciones: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+@bp.route("/generations/summary", methods=["GET"])
+@verify_token_middleware
+def get_user_generations_summary():
+    """Resumen del usuario para el dashboard: generaciones por tipo, las más recientes y bytes ocupados."""
+    try:
+        user_uid = request.user["uid"]
+        summary = generation_summary.get_summary(list(SERVICE_MAP.values()), user_uid)
+        summary.pop("needs_rebuild", None)
+        return jsonify(summary), 200
+    except Exception as e:
+        current_app.logger.error(f"Error al obtener el resumen de generaciones: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
+
 @bp.route("/generation", methods=["DELETE"])
 @verify_token_middleware
 def delete_generic_generation():
@@ -350,4 +543,59 @@ def delete_generic_generation():
             return jsonify({"error": f"Tipo de generación no válido: {prediction_type_readable}"}), 400
     except Exception as e:
         current_app.logger.error(f"Error al eliminar generación: {e}", exc_info=True)
-        return jsonify({"error": "Error interno del servidor"}), 500
\ No newline at end of file
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+@bp.route("/generations/bulk_delete", methods=["POST"])
+@verify_token_middleware
+def bulk_delete_generations_route():
+    """
+    Elimina varias generaciones en una petición. JSON:
+        {"generations": [{"generation_name": ..., "prediction_type": ...}], "types": ["Imagen3D", ...]}
+    'types' vacía por completo los tipos indicados. Los borrados pequeños se hacen en la petición (200);
+    los grandes se encolan (202 con task_id, progreso en /generation_status).
+    """
+    try:
+        user_uid = request.user["uid"]
+        data = request.get_json(silent=True) or {}
+        generations = data.get("generations") or []
+        types = data.get("types") or []
+
+        targets = {}
+        for generation_type_api in types:
+            if generation_type_api not in SERVICE_MAP:
+                return jsonify({"error": f"Tipo de generación no válido: {generation_type_api}"}), 400
+            targets[SERVICE_MAP[generation_type_api].collection_name] = None
+        for generation in generations:
+            generation_name = generation.get("generation_name")
+            generation_type_api = READABLE_TO_API_TYPE_MAP.get(generation.get("prediction_type"))
+            if not generation_name or generation_type_api not in SERVICE_MAP:
+                return jsonify({"error": "Faltan datos o el tipo no es válido en 'generations'"}), 400
+            collection_name = SERVICE_MAP[generation_type_api].collection_name
+            if collection_name in targets and targets[collection_name] is None:
+                continue  # El tipo completo ya se borra.
+            targets.setdefault(collection_name, []).append(generation_name)
+
+        if not targets:
+            return jsonify({"error": "No se indicó ninguna generación que eliminar"}), 400
+
+        target_list = [{"service": service, "generation_names": names} for service, names in targets.items()]
+        pending = sum(len(names) for names in targets.values() if names is not None)
+        if None in targets.values() or pending > BULK_DELETE_SYNC_LIMIT:
+            # El dueño se registra antes de encolar: la tarea se puede seguir desde el primer evento.
+            task_id = uuid()
+            task_owners.record_owner(task_id, user_uid)
+            task = bulk_delete_generations.apply_async(args=[user_uid, target_list], task_id=task_id)
+            return jsonify({
+                "message": "El borrado se está procesando en segundo plano.",
+                "task_id": task.id
+            }), 202
+
+        services_by_collection = {service.collection_name: service for service in SERVICE_MAP.values()}
+        deleted = sum(
+            services_by_collection[target["service"]].delete_generations(user_uid, target["generation_names"])
+            for target in target_list
+        )
+        return jsonify({"success": True, "deleted": deleted}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error en el borrado masivo de generaciones: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
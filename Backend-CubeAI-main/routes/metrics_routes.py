@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify, current_app
+from middleware.auth_middleware import verify_admin_middleware
+from utils import result_cache, space_limiter, listing_cache, scratch_space
+from tasks import GENERATION_SERVICES
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route("/metrics", methods=["GET"])
+@verify_admin_middleware
+def get_metrics():
+    try:
+        return jsonify({
+            "result_cache": result_cache.get_stats(),
+            "listing_cache": listing_cache.get_stats(),
+            "scratch": scratch_space.get_stats(),
+            "spaces": {
+                name: {
+                    url: dict(replica, admission=space_limiter.get_stats(url))
+                    for url, replica in service.space_router.stats().items()
+                }
+                for name, service in GENERATION_SERVICES.items()
+            },
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error al obtener métricas: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor"}), 500
@@ -0,0 +1,42 @@
+from flask import request, session
+from flask_socketio import join_room, leave_room, emit
+from config.socketio_config import socketio
+from middleware.auth_middleware import verify_token
+from routes.generation_routes import describe_task
+from utils.task_events import TASK_STATUS_EVENT
+from utils import task_owners
+
+# Canal push que sustituye al sondeo de /generation_status: el cliente se suscribe a los
+# task_id de sus generaciones y recibe cada cambio de estado en cuanto Celery lo produce.
+# Solo puede suscribirse a las tareas de su usuario (el uid se guarda en la sesión al conectar).
+SUBSCRIBE_ERROR_EVENT = "subscribe_error"
+
+@socketio.on("connect")
+def handle_connect(auth_data):
+    id_token = (auth_data or {}).get("token")
+    if not id_token:
+        raise ConnectionRefusedError("Token de autenticación requerido")
+    try:
+        decoded_token = verify_token(id_token)
+    except Exception as e:
+        raise ConnectionRefusedError(f"Token verification failed: {str(e)}")
+    session["uid"] = decoded_token["uid"]
+
+@socketio.on("subscribe")
+def handle_subscribe(data):
+    task_id = (data or {}).get("task_id")
+    if not task_id:
+        return
+    if not task_owners.is_owner(task_id, session.get("uid")):
+        emit(SUBSCRIBE_ERROR_EVENT, {"task_id": task_id, "message": "La tarea no existe o no pertenece al usuario."},
+             to=request.sid)
+        return
+    join_room(task_id)
+    # Estado actual al suscribirse, por si la tarea cambió antes de la suscripción.
+    emit(TASK_STATUS_EVENT, dict(describe_task(task_id), task_id=task_id), to=request.sid)
+
+@socketio.on("unsubscribe")
+def handle_unsubscribe(data):
+    task_id = (data or {}).get("task_id")
+    if task_id:
+        leave_room(task_id)
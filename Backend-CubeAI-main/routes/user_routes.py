@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request, current_app
 from middleware.auth_middleware import verify_token_middleware
 from services import user_service
+from tasks import delete_user_account
+from celery import uuid
+from utils import task_owners
 
 bp = Blueprint('user', __name__)
 
@@ -70,8 +73,15 @@ def update_profile_picture():
 def delete_user():
     try:
         user_uid = request.user["uid"]
-        user_service.delete_user(user_uid)
-        return jsonify({"success": True}), 200
+        # El dueño se registra antes de encolar: la tarea se puede seguir desde el primer evento.
+        task_id = uuid()
+        task_owners.record_owner(task_id, user_uid)
+        task = delete_user_account.apply_async(args=[user_uid], task_id=task_id)
+        return jsonify({
+            "success": True,
+            "message": "La cuenta se está eliminando en segundo plano.",
+            "task_id": task.id
+        }), 202
     except Exception as e:
         current_app.logger.error(f"Error en /delete_user: {str(e)}", exc_info=True)
         return jsonify({"error": "Error interno del servidor"}), 500
\ No newline at end of file
@@ -1,6 +1,60 @@
 from config.firebase_config import db, bucket
-from utils.storage_utils import upload_to_storage
+from config.huggingface_config import download_dir
+from config.space_inputs import input_max_side
+from firebase_admin import firestore
+from utils.storage_utils import upload_to_storage, upload_artifacts, copy_artifacts, submit_upload, folder_size, delete_folders, list_blobs_by_folder
+from utils.storage_utils import is_storage_ref, ref_blob_name, download_ref
+from utils.storage_utils import is_remote_file, download_remote_file, RemoteFileGone
+from utils import input_staging, input_uploads
+from utils.hashing import is_staged_ref, staged_digest, file_digest
+from utils.image_normalization import normalize_image, normalized_path
+from services import generation_summary
+from utils import result_cache, space_limiter, listing_cache, scratch_space
+from google.cloud.exceptions import NotFound
+from utils.generation_engine import run_generation
+from utils.checkpoint_store import save_checkpoint, load_checkpoint, delete_checkpoint, checkpoint_paths, outputs_available
 from flask import current_app
+import asyncio
+import contextlib
+import copy
+import datetime
+import os
+import tempfile
+import time
+import uuid
+
+# Estados del documento predictions/{uid}/{colección}/{nombre}.
+# Los documentos anteriores a las reservas no tienen 'status' y se consideran completados.
+STATUS_PENDING = "PENDING"
+STATUS_PROCESSING = "PROCESSING"
+STATUS_SUCCESS = "SUCCESS"
+STATUS_FAILURE = "FAILURE"
+
+# Estados de progreso propios (estados de Celery) que se publican durante la generación, en orden.
+STATE_PREPROCESSED = "PREPROCESSED"
+STATE_SAMPLED_3D = "SAMPLED_3D"
+STATE_GLB_EXTRACTED = "GLB_EXTRACTED"
+STATE_UPLOADED = "UPLOADED"
+
+# Campos que necesitan las tarjetas del historial (sin raw_data ni otros datos de la generación).
+CARD_FIELDS = ["generation_name", "prediction_type", "timestamp", "status", "error_message",
+               "modelUrl", "previewUrl", "previewImageUrl", "downloads"]
+
+# Documentos por batch de escritura de Firestore en los borrados masivos (límite: 500 operaciones).
+BULK_DELETE_CHUNK_SIZE = 200
+
+# Streaming de salidas: el cliente del Space no descarga los archivos y la etapa de subida los
+# copia de su URL al bucket por bloques, sin copia local. Las salidas intermedias que se
+# reenvían al Space (con checkpoint) sí se descargan al espacio de trabajo.
+SPACE_OUTPUT_STREAMING = os.getenv("SPACE_OUTPUT_STREAMING", "false").lower() == "true"
+
+# Réplicas distintas que se prueban como máximo en una misma etapa antes de darla por fallida.
+SPACE_FAILOVER_ATTEMPTS = int(os.getenv("SPACE_FAILOVER_ATTEMPTS", "3"))
+
+DUPLICATE_NAME_MESSAGE = "El nombre de la generación ya existe. Por favor, elige otro nombre."
+
+class GenerationCancelled(RuntimeError):
+    """La reserva de la generación se borró (o pasó a otra tarea) mientras se procesaba."""
 
 class BaseGenerationService:
     """
@@ -18,16 +72,551 @@ class BaseGenerationService:
             raise ValueError("El nombre de la colección y el nombre legible son requeridos.")
         self.collection_name = collection_name
         self.readable_name = readable_name
+        # Parámetros fijos que cada servicio envía al Space (pasos de muestreo, guidance,
+        # mesh_simplify, texture_size...). Forman parte de la clave de la caché de resultados.
+        self.pipeline_params = {}
+        # Resolución de trabajo del Space: las imágenes de entrada se reducen a este lado mayor.
+        self.input_max_side = input_max_side(collection_name)
 
-    def _generation_exists(self, user_uid: str, generation_name: str) -> bool:
-        """Verifica si una generación ya existe en Firestore."""
-        doc_ref = db.collection('predictions').document(user_uid).collection(self.collection_name).document(generation_name)
-        return doc_ref.get().exists
+    def _generation_ref(self, user_uid: str, generation_name: str):
+        return db.collection('predictions').document(user_uid).collection(self.collection_name).document(generation_name)
+
+    def reserve_generation(self, user_uid: str, generation_name: str, task_id: str):
+        """
+        Reserva atómicamente el nombre de la generación con un documento en estado PENDING.
+        Solo se puede reutilizar el nombre de una generación fallida.
+        Raises:
+            ValueError: Si ya existe una generación (completada o en curso) con ese nombre.
+        """
+        doc_ref = self._generation_ref(user_uid, generation_name)
+
+        @firestore.transactional
+        def reserve(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if snapshot.exists and (snapshot.to_dict() or {}).get("status") != STATUS_FAILURE:
+                raise ValueError(DUPLICATE_NAME_MESSAGE)
+            transaction.set(doc_ref, {
+                "generation_name": generation_name,
+                "prediction_type": self.readable_name,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "status": STATUS_PENDING,
+                "task_id": task_id,
+            })
+
+        reserve(db.transaction())
+        listing_cache.invalidate(user_uid, self.collection_name)
+
+    def _start_processing(self, job: dict):
+        """
+        Pasa la reserva del job a PROCESSING. Si no hay reserva (ejecución directa sin ruta),
+        la crea en este momento con las mismas reglas que reserve_generation.
+        Raises:
+            GenerationCancelled: Si el job se encoló con reserva y esta ya no existe (se borró).
+        """
+        doc_ref = self._generation_ref(job["user_uid"], job["generation_name"])
+
+        @firestore.transactional
+        def start(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            data = (snapshot.to_dict() or {}) if snapshot.exists else None
+            if data is None and job["tracking_id"]:
+                raise GenerationCancelled("La generación se eliminó antes de empezar a procesarse.")
+            if data is not None:
+                owned = data.get("task_id") == job["tracking_id"] and data.get("status") in (STATUS_PENDING, STATUS_PROCESSING)
+                if not owned and data.get("status") != STATUS_FAILURE:
+                    raise ValueError(DUPLICATE_NAME_MESSAGE)
+            transaction.set(doc_ref, {
+                "generation_name": job["generation_name"],
+                "prediction_type": self.readable_name,
+                "timestamp": (data or {}).get("timestamp") or datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "status": STATUS_PROCESSING,
+                "task_id": job["tracking_id"],
+            })
+
+        start(db.transaction())
+        listing_cache.invalidate(job["user_uid"], self.collection_name)
+
+    def mark_failed(self, user_uid: str, generation_name: str, task_id: str, error_message: str):
+        """Marca la reserva como fallida para que el usuario vea el error y pueda reanudarla o reutilizar el nombre."""
+        doc_ref = self._generation_ref(user_uid, generation_name)
+
+        @firestore.transactional
+        def fail(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists or (snapshot.to_dict() or {}).get("task_id") != task_id:
+                return
+            transaction.update(doc_ref, {"status": STATUS_FAILURE, "error_message": error_message})
+
+        fail(db.transaction())
+        listing_cache.invalidate(user_uid, self.collection_name)
+
+    def _generation_folder(self, user_uid: str, generation_name: str) -> str:
+        return f'{user_uid}/{self.collection_name}/{generation_name}'
+
+    def _ensure_not_cancelled(self, job: dict):
+        """
+        Borrar el documento de una generación en curso la cancela: cada etapa comprueba que su
+        reserva sigue existiendo y es suya antes de escribir en Storage o en Firestore.
+        Raises:
+            GenerationCancelled: Si la reserva ya no existe o pertenece a otra tarea.
+        """
+        snapshot = self._generation_ref(job["user_uid"], job["generation_name"]).get(field_paths=["task_id"])
+        if not snapshot.exists or (snapshot.to_dict() or {}).get("task_id") != job["tracking_id"]:
+            raise GenerationCancelled("La generación se eliminó mientras se procesaba.")
+
+    def _discard_cancelled(self, job: dict):
+        """Borra lo que una generación cancelada llegó a dejar en disco, en Storage y en Redis."""
+        self.cleanup_job_files(job)
+        delete_folders([self._generation_folder(job["user_uid"], job["generation_name"])])
+        delete_checkpoint(job)
+        input_uploads.discard_uploads(job["inputs"])
+
+    def new_job(self, user_uid: str, generation_name: str, inputs: dict) -> dict:
+        """
+        Crea el estado serializable que recorre las etapas de una generación.
+        Args:
+            inputs (dict): Entradas propias del servicio (rutas de imágenes, prompts...).
+        """
+        return {
+            "service": self.collection_name,
+            "user_uid": user_uid,
+            "generation_name": generation_name,
+            "inputs": inputs,
+            "tracking_id": None,
+            "inflight_key": None,
+            "cache_key": None,
+            "completed_stages": [],
+            "checkpoints": {},
+            "artifacts": {},
+            "urls": {},
+            "temp_files": [],
+            "local_inputs": {},
+            "workspace": None,
+        }
+
+    def _restore_job(self, job: dict) -> dict:
+        """
+        Recupera el checkpoint de la generación si existe y corresponde a las mismas entradas,
+        para continuar desde la última etapa/paso completado en lugar de empezar de cero.
+        """
+        saved = load_checkpoint(job["service"], job["user_uid"], job["generation_name"])
+        if not saved or saved.get("inputs") != job["inputs"]:
+            return job
+        saved["tracking_id"] = job.get("tracking_id") or saved.get("tracking_id")
+        return saved
+
+    async def _checkpointed_step(self, job: dict, step: str, step_fn):
+        """
+        Ejecuta un paso del Space reutilizable (independiente del estado de la sesión),
+        guardando su salida para que un reintento no vuelva a gastar GPU en él.
+        """
+        previous = job["checkpoints"].get(step)
+        if previous is not None and outputs_available(previous):
+            print(f"Reutilizando el paso '{step}' de '{job['generation_name']}' desde el checkpoint.")
+            return previous
+        result = await step_fn()
+        job["checkpoints"][step] = result
+        # Copia tomada en el event loop: la subida anticipada puede modificar el job mientras se guarda.
+        await asyncio.to_thread(save_checkpoint, copy.deepcopy(job))
+        return result
+
+    def _complete_stage(self, job: dict, stage: str):
+        if stage not in job["completed_stages"]:
+            job["completed_stages"].append(stage)
+        save_checkpoint(job)
+
+    async def _run_space_pipeline(self, client, job: dict, report):
+        """
+        Ejecuta las llamadas al Space. Debe rellenar job['artifacts'] (nombre destino -> ruta local)
+        y registrar en job['temp_files'] los archivos descargados.
+        Args:
+            report (callable): await report(estado, **metadatos) publica el progreso (STATE_*)
+                desde un hilo, sin bloquear el event loop de la sesión.
+        """
+        raise NotImplementedError
+
+    async def _space_output(self, job: dict, value, description: str, keep_local: bool = False) -> str:
+        """
+        Valida un archivo de salida del Space y devuelve su ruta local o, en modo streaming,
+        su URL en el Space (la etapa de subida la copia al bucket sin pasar por disco).
+        Args:
+            keep_local (bool): Descarga la salida aunque haya streaming (las que se reenvían al Space).
+        Raises:
+            FileNotFoundError: Si el Space no devolvió el archivo.
+        """
+        if isinstance(value, dict):
+            value = value.get("url") or value.get("path")
+        elif hasattr(value, "url"):
+            value = value.url or value.path
+        if is_remote_file(value):
+            if not keep_local:
+                return value
+            value = await asyncio.to_thread(download_remote_file, value, job["workspace"])
+        if not value or not os.path.exists(value):
+            raise FileNotFoundError(f"El archivo {description} no existe: {value}")
+        job["temp_files"].append(value)
+        return value
+
+    @contextlib.asynccontextmanager
+    async def _preview_upload(self, job: dict, preview_path: str, report):
+        """
+        Sube el vídeo de previsualización mientras se ejecuta el bloque (/extract_glb) y publica
+        su URL en cuanto está disponible. Al salir del bloque espera a la subida; si el bloque
+        falla, la cancela (o espera a que termine de publicar) sin tocar el job ni el progreso,
+        para que ni el estado FAILURE ni las URLs de otro intento se sobrescriban después.
+        Si la subida falla, la subida final de artefactos lo vuelve a intentar.
+        """
+        generation_folder = self._generation_folder(job["user_uid"], job["generation_name"])
+        failed = False
+        uploading = True
+
+        async def upload():
+            nonlocal uploading
+            try:
+                url = await asyncio.wrap_future(submit_upload(preview_path, f'{generation_folder}/preview.mp4'))
+            except Exception as e:
+                print(f"Error al subir la previsualización de '{job['generation_name']}': {e}")
+                return
+            finally:
+                uploading = False
+            if failed:
+                return
+            job["urls"]["preview.mp4"] = url
+            await report(STATE_SAMPLED_3D)
+
+        task = asyncio.ensure_future(upload())
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            # Solo se cancela durante la subida: la publicación en curso se deja terminar para que
+            # no quede un hilo escribiendo el progreso después de que la cadena marque el fallo.
+            if failed and uploading:
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _build_raw_data(self, job: dict) -> dict:
+        """Datos propios del servicio que se guardan en 'raw_data'."""
+        return {}
+
+    def _translate_space_error(self, error: Exception):
+        """Permite a cada servicio traducir errores del Space a mensajes para el usuario."""
+        return None
+
+    def _is_replica_unavailable(self, error: Exception) -> bool:
+        """Errores que indican que la réplica no puede atender (caída, dormida o sin cuota), no que el job sea inválido."""
+        return isinstance(error, (ConnectionError, TimeoutError)) or "quota" in str(error).lower()
+
+    def _link_cached_result(self, job: dict) -> bool:
+        """
+        Si otra generación ya produjo un resultado para las mismas entradas y parámetros,
+        copia sus artefactos en la carpeta de esta generación sin llamar al Space.
+        """
+        if not result_cache.RESULT_CACHE_ENABLED:
+            return False
+        job["cache_key"] = result_cache.compute_cache_key(
+            self.collection_name, self.space_router.primary_url, job["inputs"], self.pipeline_params
+        )
+        cached = result_cache.get_cached_result(job["cache_key"])
+        if cached is None:
+            return False
 
-    def get_generations(self, user_uid: str) -> list:
-        """Obtiene todas las generaciones de este tipo para un usuario."""
+        generation_folder = self._generation_folder(job["user_uid"], job["generation_name"])
+        try:
+            job["urls"] = copy_artifacts(cached["folder"], generation_folder, cached["artifacts"])
+        except NotFound:
+            # La generación original se borró: la entrada ya no sirve.
+            result_cache.evict(job["cache_key"])
+            return False
+
+        print(f"Resultado de '{job['generation_name']}' obtenido de la caché ({cached['folder']}).")
+        self._complete_stage(job, "space")
+        self._complete_stage(job, "upload")
+        return True
+
+    def cleanup_job_files(self, job: dict, keep: list = None):
+        """Elimina los archivos temporales del job, salvo los indicados en keep."""
+        keep = set(keep or [])
+        remaining = []
+        for file_path in job["temp_files"]:
+            if file_path in keep:
+                remaining.append(file_path)
+                continue
+            if file_path and os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    print(f"Error al eliminar el archivo temporal {file_path}: {e}")
+        job["temp_files"] = remaining
+
+    def input_file(self, job: dict, key: str) -> str:
+        """
+        Ruta local de una entrada de archivo, ya normalizada (ver prepare_inputs).
+        Las del staging ('staged:') se leen de la caché local del nodo y las subidas directas
+        ('gs://') se descargan en el worker que ejecuta la etapa.
+        """
+        local_inputs = job.setdefault("local_inputs", {})
+        local_path = local_inputs.get(key)
+        if local_path is not None and os.path.exists(local_path):
+            return local_path
+
+        value = job["inputs"][key]
+        if is_staged_ref(value):
+            local_path = self._normalize_input(input_staging.fetch(value), staged_digest(value))
+        elif is_storage_ref(value):
+            fd, download_path = tempfile.mkstemp(prefix="input_", suffix=os.path.splitext(ref_blob_name(value))[1],
+                                                 dir=job.get("workspace"))
+            os.close(fd)
+            try:
+                download_ref(value, download_path)
+                local_path = self._normalize_input(download_path, file_digest(download_path))
+            finally:
+                os.remove(download_path)
+        else:
+            local_path = self._normalize_input(value, file_digest(value))
+        local_inputs[key] = local_path
+        return local_path
+
+    async def _input_path(self, job: dict, key: str) -> str:
+        """input_file desde el event loop: la descarga y la normalización (si faltan) van a un hilo."""
+        return await asyncio.to_thread(self.input_file, job, key)
+
+    def _normalize_input(self, source_path: str, digest: str) -> str:
+        """Imagen reducida a input_max_side y recodificada; se reutiliza de la caché local por contenido."""
+        os.makedirs(input_staging.INPUT_CACHE_DIR, exist_ok=True)
+        destination_base = os.path.join(input_staging.INPUT_CACHE_DIR, f"{digest}-{self.input_max_side}")
+        cached = normalized_path(destination_base)
+        if cached is not None:
+            os.utime(cached)
+            return cached
+        return normalize_image(source_path, destination_base, self.input_max_side)
+
+    def prepare_inputs(self, job: dict):
+        """
+        Trae a disco y normaliza las imágenes de entrada ('*_path') antes de la sesión en el Space,
+        para que ni la descarga ni la decodificación bloqueen el event loop de la sesión.
+        """
+        for key in job["inputs"]:
+            if key.endswith("_path"):
+                self.input_file(job, key)
+
+    def run_space_stage(self, job: dict, on_progress=None) -> dict:
+        """
+        Etapa 1 (cola remote_gpu): ejecuta la sesión completa en el Space y sube sus salidas a
+        Storage desde el mismo worker, ya que los artefactos solo existen en el disco de este nodo.
+        Args:
+            on_progress (callable): Recibe (estado, metadatos) en cada cambio de progreso:
+                'QUEUED' con la posición en la cola de admisión, 'PROCESSING' al obtener turno
+                y durante la subida, y 'UPLOADED' con las URLs de los artefactos.
+        """
+        notify = on_progress or (lambda state, meta: None)
+
+        def report(state, **meta):
+            scratch_space.check_quota(job)
+            # La URL de la previsualización, una vez subida, acompaña a todos los estados siguientes.
+            if job["urls"].get("preview.mp4"):
+                meta["preview_url"] = job["urls"]["preview.mp4"]
+            notify(state, meta)
+
+        job = self._restore_job(job)
+        if "upload" in job["completed_stages"]:
+            return job
+
+        # Las salidas de un intento anterior solo se reutilizan si siguen en el disco de este nodo.
+        space_done = "space" in job["completed_stages"] and outputs_available(job["artifacts"])
+        if not space_done:
+            self._start_processing(job)
+            if self._link_cached_result(job):
+                report(STATE_UPLOADED, model_url=job["urls"].get("model.glb"))
+                return job
+
+        scratch_space.acquire(job)
+        cancelled = False
+        try:
+            if not space_done:
+                self.prepare_inputs(job)
+                self._run_space_session(job, report)
+                scratch_space.check_quota(job)
+                self._complete_stage(job, "space")
+            self._ensure_not_cancelled(job)
+            report("PROCESSING", stage="upload")
+            self._upload_outputs(job)
+        except GenerationCancelled:
+            cancelled = True
+            self._discard_cancelled(job)
+            raise
+        finally:
+            # Si la subida falla, los artefactos se quedan en el espacio de trabajo para reanudar desde aquí.
+            scratch_space.release(job, remove=cancelled or "upload" in job["completed_stages"])
+
+        report(STATE_UPLOADED, model_url=job["urls"].get("model.glb"))
+        return job
+
+    def _run_space_session(self, job: dict, report):
+        """Ejecuta la sesión en la mejor réplica disponible, pasando a otra si falla o si su cola no avanza."""
+        ticket = job["tracking_id"] or str(uuid.uuid4())
+        router = self.space_router
+
+        async def report_async(state, **meta):
+            # Redis, el backend de Celery, el emit del socket y la cuota recorren disco: fuera del loop.
+            await asyncio.to_thread(report, state, **meta)
+
+        tried = []
+        while True:
+            candidates = [url for url in router.ranked(space_limiter.free_slots) if url not in tried]
+            url, others = candidates[0], candidates[1:]
+            tried.append(url)
+
+            def should_abandon(url=url, others=others):
+                # Se deja la cola si la réplica se marcó como caída o si otra sana tiene plazas libres.
+                return bool(others) and (not router.is_healthy(url) or any(
+                    router.is_healthy(other) and space_limiter.free_slots(other) > 0 for other in others))
+
+            try:
+                with space_limiter.space_slot(
+                    url, ticket,
+                    on_queued=lambda position: report("QUEUED", queue_position=position),
+                    should_abandon=should_abandon,
+                ):
+                    report("PROCESSING", stage="space")
+                    started = time.monotonic()
+                    job["urls"] = {}
+                    outputs_dir = None if SPACE_OUTPUT_STREAMING else job["workspace"]
+                    with router.pools[url].lease() as client, download_dir(client, outputs_dir):
+                        run_generation(self._run_space_pipeline(client, job, report_async))
+            except space_limiter.AdmissionAbandoned:
+                tried.remove(url)
+                print(f"'{job['generation_name']}' cambia de réplica mientras espera turno (deja {url}).")
+                continue
+            except Exception as e:
+                # Se conservan las salidas con checkpoint para poder reanudar desde ellas.
+                self.cleanup_job_files(job, keep=checkpoint_paths(job["checkpoints"]))
+                job["artifacts"] = {}
+                save_checkpoint(job)
+                if isinstance(e, scratch_space.ScratchQuotaExceeded):
+                    raise  # No es un fallo de la réplica: otra réplica daría el mismo resultado.
+                router.record_failure(url, unhealthy=self._is_replica_unavailable(e))
+                if others and len(tried) < SPACE_FAILOVER_ATTEMPTS:
+                    print(f"Fallo de '{job['generation_name']}' en {url}: {e}. Se reintenta en otra réplica.")
+                    continue
+                translated = self._translate_space_error(e)
+                if translated is None:
+                    raise
+                raise translated from e
+
+            router.record_success(url, time.monotonic() - started)
+            break
+
+    def _upload_outputs(self, job: dict):
+        """Sube los artefactos a Storage y limpia los archivos locales (parte final de la etapa Space)."""
+        generation_folder = self._generation_folder(job["user_uid"], job["generation_name"])
+        # Los artefactos ya publicados durante la sesión (la previsualización) no se vuelven a subir.
+        pending = {name: path for name, path in job["artifacts"].items() if name not in job["urls"]}
+        try:
+            job["urls"].update(upload_artifacts(generation_folder, pending))
+        except RemoteFileGone:
+            # Las salidas en streaming caducaron en el Space: al reanudar se vuelve a ejecutar la sesión.
+            job["completed_stages"] = [stage for stage in job["completed_stages"] if stage != "space"]
+            job["artifacts"] = {}
+            save_checkpoint(job)
+            raise
+        self.cleanup_job_files(job)
+        if job.get("cache_key"):
+            result_cache.store_result(job["cache_key"], generation_folder, list(job["urls"].keys()))
+        self._complete_stage(job, "upload")
+
+    def run_persist_stage(self, job: dict) -> dict:
+        """Etapa 2 (cola io): guarda el documento de la generación en Firestore."""
+        glb_url = job["urls"]["model.glb"]
+        normalized_result = {
+            "generation_name": job["generation_name"],
+            "prediction_type": self.readable_name,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "modelUrl": glb_url,
+            "previewUrl": job["urls"].get("preview.mp4"),
+            "downloads": [{"format": "GLB", "url": glb_url}],
+            "raw_data": self._build_raw_data(job),
+            "status": STATUS_SUCCESS,
+            "task_id": job["tracking_id"],
+            "size_bytes": folder_size(self._generation_folder(job["user_uid"], job["generation_name"])),
+        }
+
+        doc_ref = self._generation_ref(job["user_uid"], job["generation_name"])
+        summary_ref = generation_summary.summary_ref(job["user_uid"])
+        user_ref = db.collection('users').document(job["user_uid"])
+
+        @firestore.transactional
+        def persist(transaction):
+            summary = summary_ref.get(transaction=transaction)
+            current = doc_ref.get(transaction=transaction)
+            # Si la reserva (o la cuenta entera) se borró mientras se procesaba, no se vuelve a crear el documento.
+            if not current.exists or (current.to_dict() or {}).get("task_id") != job["tracking_id"]:
+                raise GenerationCancelled("La generación se eliminó mientras se procesaba.")
+            if not user_ref.get(transaction=transaction).exists:
+                raise GenerationCancelled("La cuenta del usuario se eliminó mientras se procesaba la generación.")
+            # Un reintento de esta etapa no debe contar la generación dos veces en el resumen.
+            already_persisted = current.exists and (current.to_dict() or {}).get("status") == STATUS_SUCCESS
+            transaction.set(doc_ref, normalized_result)
+            if not already_persisted:
+                generation_summary.apply_created(transaction, summary, self.collection_name, normalized_result)
+
+        try:
+            persist(db.transaction())
+        except GenerationCancelled:
+            self._discard_cancelled(job)
+            raise
+        listing_cache.invalidate(job["user_uid"], self.collection_name)
+        delete_checkpoint(job)
+        input_uploads.discard_uploads(job["inputs"])
+
+        return normalized_result
+
+    def run_pipeline(self, job: dict) -> dict:
+        """Ejecuta todas las etapas en el proceso actual."""
+        job = self.run_space_stage(job)
+        return self.run_persist_stage(job)
+
+    def get_generations(self, user_uid: str, limit: int = None, start_after: str = None, fields: list = None,
+                        before: str = None) -> list:
+        """
+        Obtiene las generaciones de este tipo para un usuario, de la más reciente a la más antigua.
+        Args:
+            limit (int): Número máximo de generaciones (todas si es None).
+            start_after (str): Nombre de la última generación de la página anterior (cursor).
+                Si ya no existe se usa 'before' como cursor; sin 'before', ValueError.
+            fields (list): Campos a leer (máscara de campos); todos si es None.
+            before (str): Solo generaciones con timestamp anterior a este (cursor por fecha).
+        """
+        params = {"limit": limit, "start_after": start_after, "fields": fields, "before": before}
+        return listing_cache.get_listing(
+            user_uid, self.collection_name, params,
+            lambda: self._query_generations(user_uid, limit, start_after, fields, before),
+        )
+
+    def _query_generations(self, user_uid, limit, start_after, fields, before) -> list:
         generations_ref = db.collection('predictions').document(user_uid).collection(self.collection_name)
-        return [gen.to_dict() for gen in generations_ref.stream()]
+        query = generations_ref.order_by("timestamp", direction=firestore.Query.DESCENDING)
+        if fields:
+            query = query.select(fields)
+        if start_after:
+            cursor = generations_ref.document(start_after).get()
+            if cursor.exists:
+                query = query.start_after(cursor)
+            elif before:
+                # El documento del cursor se ha borrado: se sigue por su fecha.
+                query = query.start_after({"timestamp": before})
+            else:
+                raise ValueError("El cursor de paginación no existe (la generación se ha borrado).")
+        elif before:
+            query = query.start_after({"timestamp": before})
+        if limit:
+            query = query.limit(limit)
+        return [gen.to_dict() for gen in query.stream()]
 
     def add_preview_image(self, user_uid: str, generation_name: str, preview_file) -> dict:
         """Añade una imagen de previsualización a una generación existente."""
@@ -40,8 +629,25 @@ class BaseGenerationService:
         generation_folder = f'{user_uid}/{self.collection_name}/{generation_name}'
         try:
             preview_image_url = upload_to_storage(preview_file, f'{generation_folder}/preview_image.png')
-            update_data = {"previewImageUrl": preview_image_url}
-            doc_ref.update(update_data)
+            summary_ref = generation_summary.summary_ref(user_uid)
+
+            @firestore.transactional
+            def update(transaction):
+                summary = summary_ref.get(transaction=transaction)
+                current = doc_ref.get(transaction=transaction).to_dict() or {}
+                # La imagen sustituye a la anterior, si la había: el tamaño se recalcula desde Storage.
+                size_bytes = folder_size(generation_folder)
+                changes = {"previewImageUrl": preview_image_url, "size_bytes": size_bytes}
+                transaction.update(doc_ref, changes)
+                if generation_summary.is_completed(current):
+                    generation_summary.apply_updated(
+                        transaction, summary, self.collection_name, generation_name, changes,
+                        bytes_delta=size_bytes - current.get("size_bytes", size_bytes),
+                    )
+                return changes
+
+            update_data = update(db.transaction())
+            listing_cache.invalidate(user_uid, self.collection_name)
 
             # Devolver el documento actualizado
             updated_doc_data = doc.to_dict()
@@ -61,13 +667,94 @@ class BaseGenerationService:
 
         # Eliminar archivos de Firebase Storage
         generation_folder = f"{user_uid}/{self.collection_name}/{generation_name}"
+        result_cache.invalidate_folder(generation_folder)
+        deleted_bytes = 0
         try:
-            blobs = bucket.list_blobs(prefix=generation_folder)
+            # Con la barra final, para no borrar también las carpetas de generaciones con nombres que empiezan igual.
+            blobs = bucket.list_blobs(prefix=f"{generation_folder}/")
             for blob in blobs:
                 blob.delete()
+                deleted_bytes += blob.size or 0
         except Exception as e:
             current_app.logger.error(f"Error al eliminar archivos de Storage para {generation_name}: {e}", exc_info=True)
 
-        # Eliminar documento de Firestore
-        doc_ref.delete()
-        return True
\ No newline at end of file
+        # Eliminar documento de Firestore y descontarlo del resumen del usuario
+        summary_ref = generation_summary.summary_ref(user_uid)
+
+        @firestore.transactional
+        def delete(transaction):
+            summary = summary_ref.get(transaction=transaction)
+            current = doc_ref.get(transaction=transaction)
+            if not current.exists:
+                return
+            transaction.delete(doc_ref)
+            if generation_summary.is_completed(current.to_dict() or {}):
+                generation_summary.apply_deleted(transaction, summary, self.collection_name, generation_name, deleted_bytes)
+
+        delete(db.transaction())
+        listing_cache.invalidate(user_uid, self.collection_name)
+        return True
+
+    def active_task_ids(self, user_uid: str) -> list:
+        """task_id de las generaciones de este tipo del usuario que siguen en curso (PENDING o PROCESSING)."""
+        generations_ref = db.collection('predictions').document(user_uid).collection(self.collection_name)
+        query = generations_ref.where("status", "in", [STATUS_PENDING, STATUS_PROCESSING]).select(["task_id"])
+        return [task_id for task_id in ((doc.to_dict() or {}).get("task_id") for doc in query.stream()) if task_id]
+
+    def list_generation_names(self, user_uid: str) -> list:
+        """Nombres de todas las generaciones de este tipo del usuario (solo lee los identificadores)."""
+        generations_ref = db.collection('predictions').document(user_uid).collection(self.collection_name)
+        return [doc.id for doc in generations_ref.select(["generation_name"]).stream()]
+
+    def delete_generations(self, user_uid: str, generation_names: list = None, on_progress=None,
+                           whole_type: bool = False) -> int:
+        """
+        Elimina varias generaciones (todas las del tipo si generation_names es None) por lotes:
+        borrados batch en Storage y una transacción de Firestore por lote. Las generaciones en curso
+        también se borran: sus etapas detectan que la reserva ya no existe y se cancelan sin recrearla.
+        Args:
+            on_progress (callable): Recibe el número de generaciones procesadas tras cada lote.
+            whole_type (bool): generation_names son todas las del tipo (de list_generation_names).
+        Returns:
+            int: Número de generaciones eliminadas.
+        """
+        if generation_names is None:
+            generation_names = self.list_generation_names(user_uid)
+            whole_type = True
+        # Al vaciar el tipo, Storage se lista una sola vez para todos los lotes.
+        listed = list_blobs_by_folder(f"{user_uid}/{self.collection_name}/") if whole_type else None
+        generation_names = list(dict.fromkeys(generation_names))
+        summary_ref = generation_summary.summary_ref(user_uid)
+        deleted = 0
+
+        @firestore.transactional
+        def delete_chunk(transaction, refs, sizes):
+            # El resumen y los estados se releen en la transacción: una generación que termina
+            # (o empieza) mientras tanto se descuenta según su estado final.
+            summary = summary_ref.get(transaction=transaction)
+            snapshots = [snap for snap in db.get_all(refs, field_paths=["status"], transaction=transaction) if snap.exists]
+            completed = [snap.id for snap in snapshots if generation_summary.is_completed(snap.to_dict() or {})]
+            for snap in snapshots:
+                transaction.delete(snap.reference)
+            generation_summary.apply_bulk_deleted(
+                transaction, summary, self.collection_name, completed,
+                sum(sizes.get(self._generation_folder(user_uid, name), 0) for name in completed),
+            )
+            return len(snapshots)
+
+        for start in range(0, len(generation_names), BULK_DELETE_CHUNK_SIZE):
+            chunk = generation_names[start:start + BULK_DELETE_CHUNK_SIZE]
+            refs = [self._generation_ref(user_uid, name) for name in chunk]
+            snapshots = [snap for snap in db.get_all(refs, field_paths=["status"]) if snap.exists]
+            folders = {snap.id: self._generation_folder(user_uid, snap.id) for snap in snapshots}
+
+            for folder in folders.values():
+                result_cache.invalidate_folder(folder)
+            sizes = delete_folders(list(folders.values()), listed=listed)
+
+            deleted += delete_chunk(db.transaction(), refs, sizes)
+            if on_progress:
+                on_progress(min(start + len(chunk), len(generation_names)))
+
+        listing_cache.invalidate(user_uid, self.collection_name)
+        return deleted
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import heapq
+
+# Lecturas concurrentes de las colecciones de cada tipo (una por servicio).
+_feed_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="generation-feed")
+
+def encode_cursor(item: dict) -> str:
+    """Cursor del feed: fecha, colección y nombre de la última generación devuelta."""
+    return f'{item["timestamp"]}|{item["_collection"]}|{item["generation_name"]}'
+
+def decode_cursor(cursor: str):
+    """
+    Raises:
+        ValueError: Si el cursor no tiene el formato esperado.
+    """
+    parts = cursor.split("|", 2)
+    if len(parts) != 3 or not all(parts):
+        raise ValueError("Cursor de paginación no válido.")
+    return parts
+
+def get_feed(services: list, user_uid: str, limit: int, cursor: str = None, fields: list = None) -> dict:
+    """
+    Feed de todas las generaciones del usuario, de la más reciente a la más antigua.
+    Lee en paralelo una página de cada colección (ya ordenada por fecha en Firestore)
+    y las combina con un merge de k vías; nunca se leen más de 'limit' documentos por colección.
+    Returns:
+        dict: {'items': [...], 'next_cursor': str | None}
+    """
+    before, cursor_collection, cursor_name = decode_cursor(cursor) if cursor else (None, None, None)
+    if fields and "timestamp" not in fields:
+        fields = list(fields) + ["timestamp"]
+
+    def read(service):
+        if service.collection_name == cursor_collection:
+            # En la colección del cursor, el documento desempata las fechas iguales; si se ha
+            # borrado entre páginas, se sigue por la fecha del cursor.
+            items = service.get_generations(user_uid, limit=limit, start_after=cursor_name, fields=fields,
+                                            before=before)
+        else:
+            items = service.get_generations(user_uid, limit=limit, before=before, fields=fields)
+        for item in items:
+            item["_collection"] = service.collection_name
+        return items
+
+    pages = list(_feed_executor.map(read, services))
+    merged = list(islice(heapq.merge(*pages, key=lambda item: item.get("timestamp") or "", reverse=True), limit))
+
+    next_cursor = encode_cursor(merged[-1]) if len(merged) == limit else None
+    for item in merged:
+        item.pop("_collection")
+    return {"items": merged, "next_cursor": next_cursor}
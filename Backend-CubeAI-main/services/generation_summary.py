@@ -0,0 +1,138 @@
+from config.firebase_config import db, bucket
+from firebase_admin import firestore
+from services import generation_feed
+import datetime
+import os
+
+# Resumen por usuario en predictions/{uid} (el documento padre de las colecciones de cada tipo):
+# número de generaciones por tipo, las más recientes y el total de bytes en Storage.
+# Se actualiza en la misma transacción que cada escritura de una generación.
+SUMMARY_RECENT_LIMIT = int(os.getenv("SUMMARY_RECENT_LIMIT", "10"))
+
+RECENT_FIELDS = ["generation_name", "prediction_type", "timestamp", "previewUrl", "previewImageUrl", "modelUrl"]
+
+def summary_ref(user_uid: str):
+    return db.collection('predictions').document(user_uid)
+
+def _recent_entry(collection_name: str, generation: dict) -> dict:
+    entry = {field: generation.get(field) for field in RECENT_FIELDS}
+    entry["collection"] = collection_name
+    return entry
+
+def _is_same(entry: dict, collection_name: str, generation_name: str) -> bool:
+    return entry["collection"] == collection_name and entry["generation_name"] == generation_name
+
+def apply_created(transaction, snapshot, collection_name: str, generation: dict):
+    """
+    Suma una generación completada al resumen. Requiere haber leído 'snapshot' en la transacción.
+    Si el usuario aún no tiene resumen no se hace nada: se reconstruye completo en la primera lectura.
+    """
+    if not snapshot.exists:
+        return
+    summary = snapshot.to_dict()
+    summary["counts"][collection_name] = summary["counts"].get(collection_name, 0) + 1
+    summary["total_count"] = summary.get("total_count", 0) + 1
+    summary["total_bytes"] = summary.get("total_bytes", 0) + generation.get("size_bytes", 0)
+    recent = [entry for entry in summary["recent"] if not _is_same(entry, collection_name, generation["generation_name"])]
+    recent.append(_recent_entry(collection_name, generation))
+    recent.sort(key=lambda entry: entry.get("timestamp") or "", reverse=True)
+    summary["recent"] = recent[:SUMMARY_RECENT_LIMIT]
+    summary["updated_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    transaction.set(snapshot.reference, summary)
+
+def apply_updated(transaction, snapshot, collection_name: str, generation_name: str, changes: dict, bytes_delta: int = 0):
+    """Refleja en el resumen un cambio en una generación (p. ej. su imagen de previsualización)."""
+    if not snapshot.exists:
+        return
+    summary = snapshot.to_dict()
+    summary["total_bytes"] = summary.get("total_bytes", 0) + bytes_delta
+    for entry in summary["recent"]:
+        if _is_same(entry, collection_name, generation_name):
+            entry.update({field: value for field, value in changes.items() if field in RECENT_FIELDS})
+    summary["updated_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    transaction.set(snapshot.reference, summary)
+
+def apply_deleted(transaction, snapshot, collection_name: str, generation_name: str, size_bytes: int):
+    """
+    Resta una generación completada del resumen. Si la lista de recientes se queda corta,
+    se marca el resumen para reconstruirlo en la próxima lectura.
+    """
+    if not snapshot.exists:
+        return
+    summary = snapshot.to_dict()
+    summary["counts"][collection_name] = max(summary["counts"].get(collection_name, 0) - 1, 0)
+    summary["total_count"] = max(summary.get("total_count", 0) - 1, 0)
+    summary["total_bytes"] = max(summary.get("total_bytes", 0) - size_bytes, 0)
+    summary["recent"] = [entry for entry in summary["recent"] if not _is_same(entry, collection_name, generation_name)]
+    if len(summary["recent"]) < min(SUMMARY_RECENT_LIMIT, summary["total_count"]):
+        summary["needs_rebuild"] = True
+    summary["updated_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    transaction.set(snapshot.reference, summary)
+
+def apply_bulk_deleted(batch, snapshot, collection_name: str, generation_names: list, size_bytes: int):
+    """
+    Resta varias generaciones completadas en un batch de escritura o una transacción: los contadores
+    se decrementan con Increment y las entradas recientes se quitan con ArrayRemove, así que no
+    se pisan escrituras concurrentes. 'snapshot' es una lectura previa del resumen.
+    """
+    if not snapshot.exists or not generation_names:
+        return
+    summary = snapshot.to_dict()
+    names = set(generation_names)
+    removed = [entry for entry in summary.get("recent", []) if entry["collection"] == collection_name and entry["generation_name"] in names]
+    changes = {
+        f"counts.{collection_name}": firestore.Increment(-len(generation_names)),
+        "total_count": firestore.Increment(-len(generation_names)),
+        "total_bytes": firestore.Increment(-size_bytes),
+        "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    if removed:
+        changes["recent"] = firestore.ArrayRemove(removed)
+        changes["needs_rebuild"] = True
+    batch.update(snapshot.reference, changes)
+
+def is_completed(generation: dict) -> bool:
+    # Los documentos anteriores a las reservas no tienen 'status' y están completados.
+    return generation.get("status") in (None, "SUCCESS")
+
+def rebuild_summary(services: list, user_uid: str) -> dict:
+    """Recalcula el resumen desde Firestore y Storage (usuarios sin resumen o con recientes incompletos)."""
+    counts = {}
+    total_bytes = 0
+    for service in services:
+        generations_ref = summary_ref(user_uid).collection(service.collection_name)
+        counts[service.collection_name] = sum(
+            1 for doc in generations_ref.select(["status"]).stream() if is_completed(doc.to_dict())
+        )
+        total_bytes += sum(blob.size or 0 for blob in bucket.list_blobs(prefix=f"{user_uid}/{service.collection_name}/"))
+
+    collection_by_type = {service.readable_name: service.collection_name for service in services}
+    recent = []
+    cursor = None
+    # Se recorre el feed hasta reunir SUMMARY_RECENT_LIMIT generaciones completadas.
+    while len(recent) < SUMMARY_RECENT_LIMIT:
+        page = generation_feed.get_feed(services, user_uid, SUMMARY_RECENT_LIMIT, cursor=cursor, fields=RECENT_FIELDS + ["status"])
+        for generation in page["items"]:
+            if is_completed(generation):
+                recent.append(_recent_entry(collection_by_type.get(generation.get("prediction_type")), generation))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    summary = {
+        "counts": counts,
+        "total_count": sum(counts.values()),
+        "total_bytes": total_bytes,
+        "recent": recent[:SUMMARY_RECENT_LIMIT],
+        "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    summary_ref(user_uid).set(summary)
+    return summary
+
+def get_summary(services: list, user_uid: str) -> dict:
+    """Lee el resumen del usuario (una sola lectura), reconstruyéndolo si falta o está incompleto."""
+    snapshot = summary_ref(user_uid).get()
+    summary = snapshot.to_dict() if snapshot.exists else None
+    if not summary or summary.get("needs_rebuild") or "counts" not in summary:
+        summary = rebuild_summary(services, user_uid)
+    return summary
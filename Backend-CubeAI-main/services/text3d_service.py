@@ -1,11 +1,9 @@
-from .base_generation_service import BaseGenerationService
-from config.firebase_config import db
-from config.huggingface_config import create_hf_client
+from .base_generation_service import BaseGenerationService, STATE_SAMPLED_3D, STATE_GLB_EXTRACTED
+from config.huggingface_config import get_space_router
 from dotenv import load_dotenv
 from huggingface_hub import login
-import datetime
 import os
-from utils.storage_utils import upload_to_storage
+from utils.generation_engine import space_call
 
 load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
@@ -14,84 +12,66 @@ login(token=HF_TOKEN)
 class Text3DService(BaseGenerationService):
     def __init__(self):
         super().__init__(collection_name="Texto3D", readable_name="Texto a 3D")
-        self.client = create_hf_client(os.getenv("CLIENT_TEXTO3D_URL"))
-
-    def create_text3d(self, user_uid, generation_name, user_prompt, selected_style):
-        if self._generation_exists(user_uid, generation_name):
-            raise ValueError("El nombre de la generación ya existe. Por favor, elige otro nombre.")
-
-        full_prompt = f"A {selected_style} 3D render of {user_prompt}. Style: {selected_style}. Emphasize essential features and textures with vibrant colors."
-        temp_files_to_clean = []
-
-        try:
-            self.client.predict(api_name="/start_session")
-
-            result_get_seed = self.client.predict(randomize_seed=True, seed=0, api_name="/get_seed")
-            if not isinstance(result_get_seed, int):
-                raise ValueError(f"Seed inválido: {result_get_seed}")
-            seed_value = result_get_seed
-
-            result_text_to_3d = self.client.predict(
-                prompt=full_prompt,
-                seed=seed_value,
-                ss_guidance_strength=7.5,
-                ss_sampling_steps=25,
-                slat_guidance_strength=7.5,
-                slat_sampling_steps=25,
-                api_name="/text_to_3d"
-            )
-            if not isinstance(result_text_to_3d, dict) or "video" not in result_text_to_3d:
-                raise ValueError("Error al generar modelo 3D: respuesta de la API inválida.")
-
-            generated_video_path = result_text_to_3d["video"]
-            if not os.path.exists(generated_video_path):
-                raise FileNotFoundError(f"El archivo de video generado {generated_video_path} no existe.")
-            temp_files_to_clean.append(generated_video_path)
-
-            result_extract_glb = self.client.predict(
-                mesh_simplify=0.95,
-                texture_size=1024,
+        self.space_router = get_space_router(os.getenv("CLIENT_TEXTO3D_URL"))
+        self.pipeline_params = {
+            "text_to_3d": {
+                "ss_guidance_strength": 7.5,
+                "ss_sampling_steps": 25,
+                "slat_guidance_strength": 7.5,
+                "slat_sampling_steps": 25,
+            },
+            "extract_glb": {"mesh_simplify": 0.95, "texture_size": 1024},
+        }
+
+    def _full_prompt(self, inputs):
+        selected_style = inputs["selected_style"]
+        return f"A {selected_style} 3D render of {inputs['user_prompt']}. Style: {selected_style}. Emphasize essential features and textures with vibrant colors."
+
+    async def _run_space_pipeline(self, client, job, report):
+        full_prompt = self._full_prompt(job["inputs"])
+
+        await space_call(client, api_name="/start_session")
+
+        result_get_seed = await space_call(client, randomize_seed=True, seed=0, api_name="/get_seed")
+        if not isinstance(result_get_seed, int):
+            raise ValueError(f"Seed inválido: {result_get_seed}")
+        seed_value = result_get_seed
+
+        result_text_to_3d = await space_call(client,
+            prompt=full_prompt,
+            seed=seed_value,
+            **self.pipeline_params["text_to_3d"],
+            api_name="/text_to_3d"
+        )
+        if not isinstance(result_text_to_3d, dict) or "video" not in result_text_to_3d:
+            raise ValueError("Error al generar modelo 3D: respuesta de la API inválida.")
+
+        generated_video_path = await self._space_output(job, result_text_to_3d["video"], "de video generado")
+        await report(STATE_SAMPLED_3D)
+        async with self._preview_upload(job, generated_video_path, report):
+            result_extract_glb = await space_call(client,
+                **self.pipeline_params["extract_glb"],
                 api_name="/extract_glb"
             )
-            extracted_glb_path = result_extract_glb[1]
-            if not os.path.exists(extracted_glb_path):
-                raise FileNotFoundError(f"El archivo GLB extraído {extracted_glb_path} no existe.")
-            temp_files_to_clean.append(extracted_glb_path)
-
-            self.client.predict(api_name="/end_session")
+            extracted_glb_path = await self._space_output(job, result_extract_glb[1], "GLB extraído")
+        await report(STATE_GLB_EXTRACTED)
 
-            generation_folder = f'{user_uid}/{self.collection_name}/{generation_name}'
-            glb_url = upload_to_storage(extracted_glb_path, f'{generation_folder}/model.glb')
-            preview_video_url = upload_to_storage(generated_video_path, f'{generation_folder}/preview.mp4')
+        await space_call(client, api_name="/end_session")
 
-            normalized_result = {
-                "generation_name": generation_name,
-                "prediction_type": self.readable_name,
-                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                "modelUrl": glb_url,
-                "previewUrl": preview_video_url,
-                "downloads": [{"format": "GLB", "url": glb_url}],
-                "raw_data": {
-                    "user_prompt": user_prompt,
-                    "selected_style": selected_style,
-                    "full_prompt_sent_to_api": full_prompt,
-                }
-            }
+        job["artifacts"] = {
+            "model.glb": extracted_glb_path,
+            "preview.mp4": generated_video_path,
+        }
 
-            doc_ref = db.collection('predictions').document(user_uid).collection(self.collection_name).document(generation_name)
-            doc_ref.set(normalized_result)
+    def _build_raw_data(self, job):
+        return {
+            "user_prompt": job["inputs"]["user_prompt"],
+            "selected_style": job["inputs"]["selected_style"],
+            "full_prompt_sent_to_api": self._full_prompt(job["inputs"]),
+        }
 
-            return normalized_result
-
-        except Exception as e:
-            raise
-
-        finally:
-            for file_path in temp_files_to_clean:
-                if file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except OSError as e:
-                        print(f"Error al eliminar el archivo temporal {file_path}: {e}")
+    def create_text3d(self, user_uid, generation_name, user_prompt, selected_style):
+        job = self.new_job(user_uid, generation_name, {"user_prompt": user_prompt, "selected_style": selected_style})
+        return self.run_pipeline(job)
 
-text3d_service = Text3DService()
\ No newline at end of file
+text3d_service = Text3DService()
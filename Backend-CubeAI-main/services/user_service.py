@@ -2,7 +2,11 @@ from config.firebase_config import db
 import datetime
 import firebase_admin
 from firebase_admin import auth, firestore, storage
+from celery_app import celery
+from concurrent.futures import ThreadPoolExecutor
+from utils.storage_utils import delete_prefix
 import logging
+import threading
 
 db = firestore.client()
 bucket = storage.bucket()
@@ -49,7 +53,58 @@ def update_profile_picture(user_uid, file):
         logging.error(f"Error en update_profile_picture: {str(e)}")
         raise
 
-def delete_user(user_uid):
-    user_ref = db.collection('users').document(user_uid)
-    user_ref.delete()
-    auth.delete_user(user_uid)
\ No newline at end of file
+def delete_user(user_uid, services, on_progress=None):
+    """
+    Elimina la cuenta completa en cascada: las generaciones de todos los servicios (en paralelo,
+    con borrados por lotes), cualquier archivo restante bajo '{uid}/', las fotos de perfil
+    ('{uid}_{timestamp}'), el resumen, el documento del usuario y, por último, el usuario de Auth.
+    Antes se revocan las generaciones en curso, para que ninguna vuelva a escribir en la cuenta.
+    Es idempotente: si falla a mitad, repetirla continúa donde se quedó.
+    Args:
+        services (list): Servicios de generación cuyas colecciones se vacían.
+        on_progress (callable): Recibe (etapa, procesadas, total).
+    """
+    def report(stage, processed, total):
+        if on_progress:
+            on_progress(stage, processed, total)
+
+    # Revocar el task_id de seguimiento descarta la etapa de guardado que aún no ha empezado; las
+    # etapas que ya están en marcha se cancelan al no encontrar su reserva ni el documento del usuario.
+    active_task_ids = [task_id for service in services for task_id in service.active_task_ids(user_uid)]
+    if active_task_ids:
+        celery.control.revoke(active_task_ids)
+
+    with ThreadPoolExecutor(max_workers=len(services), thread_name_prefix="account-delete") as executor:
+        names_by_service = dict(zip(services, executor.map(
+            lambda service: service.list_generation_names(user_uid), services)))
+        total = sum(len(names) for names in names_by_service.values())
+        report("generations", 0, total)
+
+        processed = {service.collection_name: 0 for service in services}
+        progress_lock = threading.Lock()
+
+        def delete_service_generations(service, names):
+            def service_progress(count):
+                with progress_lock:
+                    processed[service.collection_name] = count
+                    done = sum(processed.values())
+                report("generations", done, total)
+            return service.delete_generations(user_uid, names, on_progress=service_progress, whole_type=True)
+
+        futures = [executor.submit(delete_service_generations, service, names)
+                   for service, names in names_by_service.items()]
+        deleted = sum(future.result() for future in futures)
+
+    report("storage", deleted, total)
+    # Restos fuera de las generaciones registradas (entradas, generaciones fallidas) y fotos de perfil.
+    delete_prefix(f"{user_uid}/")
+    delete_prefix(f"{user_uid}_")
+
+    report("account", deleted, total)
+    db.collection('predictions').document(user_uid).delete()
+    db.collection('users').document(user_uid).delete()
+    try:
+        auth.delete_user(user_uid)
+    except auth.UserNotFoundError:
+        pass
+    return deleted
@@ -1,14 +1,19 @@
 # Backend-CubeAI/tasks.py
 
 import os
+from celery import chain, uuid
 from celery_app import celery
-from services.text3d_service import text3d_service # Importamos el servicio existente
-# New service imports
+from services.text3d_service import text3d_service
 from services.img3d_service import img3d_service
 from services.textimg3d_service import textimg3d_service
 from services.unico3d_service import unico3d_service
 from services.multiimg3d_service import multiimg3d_service
 from services.boceto3d_service import boceto3d_service
+from services import user_service
+from services.base_generation_service import GenerationCancelled
+from utils.checkpoint_store import load_checkpoint
+from utils import single_flight, task_owners
+from utils.task_events import publish_task_status
 
 # Es importante inicializar las dependencias que las tareas necesitan,
 # como el login de Hugging Face, DENTRO del worker.
@@ -19,106 +24,188 @@ load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
 login(token=HF_TOKEN)
 
+# Servicio responsable de cada job, indexado por el nombre de su colección.
+GENERATION_SERVICES = {
+    service.collection_name: service
+    for service in (
+        img3d_service,
+        text3d_service,
+        textimg3d_service,
+        unico3d_service,
+        multiimg3d_service,
+        boceto3d_service,
+    )
+}
 
-# El decorador @celery.task convierte esta función normal en una tarea de Celery.
-@celery.task
-def run_text3d_generation(user_uid, generation_name, user_prompt, selected_style):
-    """
-    Tarea asíncrona que ejecuta la generación de Texto a 3D.
-    Esta función se ejecutará en segundo plano en un proceso 'worker'.
-    """
+# Cada generación es una cadena de tareas:
+#   run_space_stage (cola remote_gpu) -> run_persist_stage (cola io)
+# La etapa Space sube también sus salidas a Storage: los artefactos están en el disco del nodo
+# GPU que los generó, así que ninguna etapa de otra cola lee rutas locales.
+# El estado 'job' (un dict serializable) pasa de una etapa a la siguiente y se guarda como
+# checkpoint tras cada etapa, de modo que un reintento continúa desde la última completada.
+
+@celery.task(autoretry_for=(ConnectionError, TimeoutError), max_retries=2, retry_backoff=True)
+def run_space_stage(job):
+    """Ejecuta la sesión completa en el Space y sube los artefactos a Storage."""
+    service = GENERATION_SERVICES[job["service"]]
     try:
-        # Llamamos a la función original del servicio que ya tienes.
-        # ¡No hemos tenido que reescribir la lógica de generación!
-        print(f"Iniciando generación de texto a 3D para {user_uid} con nombre '{generation_name}'")
-        
-        result = text3d_service.create_text3d(user_uid, generation_name, user_prompt, selected_style)
-        
-        print(f"Generación '{generation_name}' completada con éxito.")
-        return result
-        
+        print(f"Iniciando etapa Space de {service.readable_name} para {job['user_uid']} con nombre '{job['generation_name']}'")
+        return service.run_space_stage(job, on_progress=lambda state, meta: _report_progress(job, state, meta))
     except Exception as e:
-        # Si algo sale mal, Celery guardará la excepción.
-        # Es buena idea imprimir el error también en el log del worker.
-        print(f"ERROR en la generación '{generation_name}': {e}")
-        # Al hacer 'raise', Celery marcará la tarea como 'FAILURE'.
+        print(f"ERROR en la etapa Space de '{job['generation_name']}': {e}")
         raise e
 
-# New tasks below
-
-@celery.task
-def run_img3d_generation(user_uid, image_file_path, generation_name):
+def _report_progress(job, state, meta):
     """
-    Tarea asíncrona que ejecuta la generación de Imagen a 3D.
+    Guarda el progreso (estado propio + metadatos) en la tarea que consulta el frontend
+    y lo publica en el canal push para los clientes suscritos.
     """
+    tracking_id = job.get("tracking_id")
+    if not tracking_id:
+        return
+    celery.backend.store_result(tracking_id, meta, state)
+    publish_task_status(tracking_id, dict(meta, status=state))
+
+# Una generación cancelada (su reserva se borró) no se reintenta: pasa directamente al errback.
+@celery.task(autoretry_for=(Exception,), dont_autoretry_for=(GenerationCancelled,), max_retries=3, retry_backoff=True)
+def run_persist_stage(job):
+    """Guarda la generación en Firestore. Su resultado es el resultado de toda la generación."""
+    service = GENERATION_SERVICES[job["service"]]
     try:
-        print(f"Iniciando generación de Imagen a 3D para {user_uid} con nombre '{generation_name}' usando el archivo {image_file_path}")
-        # Assuming img3d_service.create_generation can handle image_file_path
-        # This might require modification in img3d_service to open and read the file from the path,
-        # or to receive bytes directly if that's how it's adapted.
-        # For this implementation, I will pass the path directly as per subtask guidance.
-        result = img3d_service.create_generation(user_uid, image_file_path, generation_name)
-        print(f"Generación Imagen a 3D '{generation_name}' completada con éxito.")
+        publish_task_status(job["tracking_id"], {"status": "PROCESSING", "stage": "persist"})
+        result = service.run_persist_stage(job)
+        if job.get("inflight_key"):
+            single_flight.release(job["inflight_key"], job["tracking_id"])
+        publish_task_status(job["tracking_id"], {"status": "SUCCESS", "result": result})
+        print(f"Generación {service.readable_name} '{job['generation_name']}' completada con éxito.")
         return result
     except Exception as e:
-        print(f"ERROR en la generación Imagen a 3D '{generation_name}': {e}")
+        print(f"ERROR al guardar la generación '{job['generation_name']}': {e}")
         raise e
 
 @celery.task
-def run_textimg3d_generation(user_uid, generation_name, subject, style, additional_details):
+def mark_generation_failed(request, exc, traceback, tracking_id, job_ref):
     """
-    Tarea asíncrona que ejecuta la generación de Texto+Imagen a 3D.
+    Errback de la cadena: si falla cualquier etapa, marca como FAILURE la tarea que el
+    frontend consulta (la última de la cadena), que de otro modo quedaría en PENDING,
+    y el documento reservado de la generación.
     """
+    celery.backend.mark_as_failure(tracking_id, exc, traceback=traceback, call_errbacks=False)
+    publish_task_status(tracking_id, {"status": "FAILURE", "message": str(exc)})
+    service = GENERATION_SERVICES[job_ref["service"]]
     try:
-        print(f"Iniciando generación de Texto+Imagen a 3D para {user_uid} con nombre '{generation_name}'")
-        result = textimg3d_service.create_textimg3d(user_uid, generation_name, subject, style, additional_details)
-        print(f"Generación Texto+Imagen a 3D '{generation_name}' completada con éxito.")
-        return result
+        service.mark_failed(job_ref["user_uid"], job_ref["generation_name"], tracking_id, str(exc))
     except Exception as e:
-        print(f"ERROR en la generación Texto+Imagen a 3D '{generation_name}': {e}")
-        raise e
+        print(f"ERROR al marcar como fallida la generación '{job_ref['generation_name']}': {e}")
+    if job_ref.get("inflight_key"):
+        single_flight.release(job_ref["inflight_key"], tracking_id)
 
-@celery.task
-def run_unico3d_generation(user_uid, image_file_path, generation_name):
+@celery.task(bind=True)
+def bulk_delete_generations(self, user_uid, targets):
     """
-    Tarea asíncrona que ejecuta la generación de Unico3D (Imagen única a 3D).
+    Borrado masivo en segundo plano, con progreso (estado DELETING) en la propia tarea.
+    Args:
+        targets (list): [{'service': colección, 'generation_names': [...] o None para todo el tipo}].
     """
-    try:
-        print(f"Iniciando generación de Unico3D para {user_uid} con nombre '{generation_name}' usando el archivo {image_file_path}")
-        # Similar assumption as run_img3d_generation for image_file_path
-        result = unico3d_service.create_unico3d(user_uid, image_file_path, generation_name)
-        print(f"Generación Unico3D '{generation_name}' completada con éxito.")
-        return result
-    except Exception as e:
-        print(f"ERROR en la generación Unico3D '{generation_name}': {e}")
-        raise e
+    plan = []
+    for target in targets:
+        service = GENERATION_SERVICES[target["service"]]
+        names = target.get("generation_names")
+        whole_type = names is None
+        plan.append((service, service.list_generation_names(user_uid) if whole_type else names, whole_type))
+    total = sum(len(names) for _, names, _ in plan)
 
-@celery.task
-def run_multiimg3d_generation(user_uid, frontal_image_path, lateral_image_path, trasera_image_path, generation_name):
+    done = 0
+    deleted = 0
+
+    def report(processed):
+        meta = {"processed": done + processed, "total": total}
+        self.update_state(state="DELETING", meta=meta)
+        publish_task_status(self.request.id, dict(meta, status="DELETING"))
+
+    for service, names, whole_type in plan:
+        deleted += service.delete_generations(user_uid, names, on_progress=report, whole_type=whole_type)
+        done += len(names)
+
+    print(f"Borrado masivo de {user_uid}: {deleted} generaciones eliminadas.")
+    result = {"deleted": deleted}
+    publish_task_status(self.request.id, {"status": "SUCCESS", "result": result})
+    return result
+
+@celery.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def delete_user_account(self, user_uid):
+    """Borrado en cascada de la cuenta, con progreso (estado DELETING y etapa) en la propia tarea."""
+    def report(stage, processed, total):
+        meta = {"stage": stage, "processed": processed, "total": total}
+        self.update_state(state="DELETING", meta=meta)
+        publish_task_status(self.request.id, dict(meta, status="DELETING"))
+
+    deleted = user_service.delete_user(user_uid, list(GENERATION_SERVICES.values()), on_progress=report)
+    print(f"Cuenta {user_uid} eliminada con {deleted} generaciones.")
+    result = {"deleted": deleted}
+    publish_task_status(self.request.id, {"status": "SUCCESS", "result": result})
+    return result
+
+def dispatch_generation(service, user_uid, generation_name, inputs):
     """
-    Tarea asíncrona que ejecuta la generación de Multi-Imagen a 3D.
+    Encola la cadena de etapas de una generación, salvo que ya haya una idéntica en curso
+    (mismo usuario, nombre y entradas), en cuyo caso se reutiliza su task_id.
+    Antes de encolar reserva el nombre con un documento PENDING.
+    Raises:
+        ValueError: Si el nombre ya está en uso.
+    Returns:
+        tuple[str, bool]: El task_id que el frontend usa en /generation_status (el de la
+        última etapa) y si se ha encolado una nueva ejecución.
     """
+    job = service.new_job(user_uid, generation_name, inputs)
+    tracking_id = uuid()
+    key = single_flight.inflight_key(service.collection_name, user_uid, generation_name, inputs)
+    existing_task_id = single_flight.claim(key, tracking_id)
+    if existing_task_id is not None:
+        return existing_task_id, False
+
+    job["inflight_key"] = key
     try:
-        print(f"Iniciando generación de Multi-Imagen a 3D para {user_uid} con nombre '{generation_name}'")
-        # Similar assumption as run_img3d_generation for image paths
-        result = multiimg3d_service.create_multiimg3d(user_uid, frontal_image_path, lateral_image_path, trasera_image_path, generation_name)
-        print(f"Generación Multi-Imagen a 3D '{generation_name}' completada con éxito.")
-        return result
-    except Exception as e:
-        print(f"ERROR en la generación Multi-Imagen a 3D '{generation_name}': {e}")
-        raise e
+        task_owners.record_owner(tracking_id, user_uid)
+        service.reserve_generation(user_uid, generation_name, tracking_id)
+        _enqueue_job(job, tracking_id)
+    except Exception:
+        single_flight.release(key, tracking_id)
+        raise
+    return tracking_id, True
 
-@celery.task
-def run_boceto3d_generation(user_uid, image_file_path, generation_name, description):
+def resume_generation(service, user_uid, generation_name):
     """
-    Tarea asíncrona que ejecuta la generación de Boceto a 3D.
+    Reanuda una generación fallida desde su checkpoint, encolando solo las etapas pendientes.
+    Returns:
+        str | None: El nuevo task_id, o None si no hay checkpoint para esa generación.
     """
-    try:
-        print(f"Iniciando generación de Boceto a 3D para {user_uid} con nombre '{generation_name}' usando el archivo {image_file_path}")
-        # Similar assumption as run_img3d_generation for image_file_path
-        result = boceto3d_service.create_boceto3d(user_uid, image_file_path, generation_name, description)
-        print(f"Generación Boceto a 3D '{generation_name}' completada con éxito.")
-        return result
-    except Exception as e:
-        print(f"ERROR en la generación Boceto a 3D '{generation_name}': {e}")
-        raise e
\ No newline at end of file
+    job = load_checkpoint(service.collection_name, user_uid, generation_name)
+    if job is None:
+        return None
+    tracking_id = uuid()
+    task_owners.record_owner(tracking_id, user_uid)
+    service.reserve_generation(user_uid, generation_name, tracking_id)
+    return _enqueue_job(job, tracking_id)
+
+def _enqueue_job(job, tracking_id):
+    job["tracking_id"] = tracking_id
+
+    # La etapa Space se encola aunque esté completada mientras falte la subida: reutiliza los
+    # artefactos si siguen en el disco del worker que la ejecuta, y los regenera si no.
+    if "upload" in job["completed_stages"]:
+        pending = [run_persist_stage]
+    else:
+        pending = [run_space_stage, run_persist_stage]
+    signatures = [pending[0].s(job)] + [task.s() for task in pending[1:]]
+
+    workflow = chain(*signatures)
+    job_ref = {
+        "service": job["service"],
+        "user_uid": job["user_uid"],
+        "generation_name": job["generation_name"],
+        "inflight_key": job.get("inflight_key"),
+    }
+    workflow.link_error(mark_generation_failed.s(tracking_id, job_ref))
+    workflow.apply_async(task_id=tracking_id)
+    return tracking_id
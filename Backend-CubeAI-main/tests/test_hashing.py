@@ -0,0 +1,23 @@
+from utils.hashing import digest_json, fingerprint_inputs, upload_digest, with_upload_digest
+import hashlib
+
+BUCKET_REF = "gs://cubeai.appspot.com/user-1/uploads/"
+
+def _direct_upload(object_id: str, data: bytes) -> str:
+    return with_upload_digest(BUCKET_REF + object_id, "md5", hashlib.md5(data).hexdigest())
+
+def test_uploads_of_the_same_bytes_share_cache_key():
+    first = {"image_path": _direct_upload("3f2a", b"imagen"), "seed": 1}
+    second = {"image_path": _direct_upload("9c1e", b"imagen"), "seed": 1}
+    assert first != second
+    assert digest_json(fingerprint_inputs(first)) == digest_json(fingerprint_inputs(second))
+
+def test_uploads_of_different_bytes_do_not_share_cache_key():
+    first = {"image_path": _direct_upload("3f2a", b"imagen")}
+    second = {"image_path": _direct_upload("3f2a", b"otra imagen")}
+    assert digest_json(fingerprint_inputs(first)) != digest_json(fingerprint_inputs(second))
+
+def test_upload_digest_requires_known_algorithm():
+    assert upload_digest(BUCKET_REF + "3f2a") is None
+    assert upload_digest(BUCKET_REF + "3f2a#crc=abc") is None
+    assert upload_digest(_direct_upload("3f2a", b"imagen")) == ("md5", hashlib.md5(b"imagen").hexdigest())
@@ -0,0 +1,30 @@
+from config.space_inputs import input_max_side
+import os
+import pytest
+
+def test_services_use_their_space_input_size(monkeypatch):
+    monkeypatch.delenv("INPUT_IMAGE_MAX_SIDE_IMAGEN3D", raising=False)
+    monkeypatch.delenv("INPUT_IMAGE_MAX_SIDE_UNICO3D", raising=False)
+    assert input_max_side("Imagen3D") == 1024
+    assert input_max_side("Unico3D") == 512
+
+def test_input_size_can_be_overridden_per_service(monkeypatch):
+    monkeypatch.setenv("INPUT_IMAGE_MAX_SIDE_UNICO3D", "768")
+    assert input_max_side("Unico3D") == 768
+    assert input_max_side("Imagen3D") == 1024
+
+def test_two_services_produce_different_normalized_sizes(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from utils.image_normalization import _normalize
+
+    source = tmp_path / "entrada.jpg"
+    Image.new("RGB", (2000, 1500), "white").save(source)
+
+    sizes = {}
+    for collection in ("Imagen3D", "Unico3D"):
+        normalized = _normalize(str(source), os.path.join(tmp_path, collection), input_max_side(collection), 92)
+        with Image.open(normalized) as image:
+            sizes[collection] = image.size
+
+    assert sizes["Imagen3D"] == (1024, 768)
+    assert sizes["Unico3D"] == (512, 384)
@@ -0,0 +1,35 @@
+from config.redis_config import redis_client
+import json
+import os
+
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", str(24 * 3600)))
+
+def _checkpoint_key(service: str, user_uid: str, generation_name: str) -> str:
+    return f"checkpoint:{user_uid}:{service}:{generation_name}"
+
+def save_checkpoint(job: dict):
+    """Persiste el estado del job (etapas completadas y salidas de cada paso)."""
+    key = _checkpoint_key(job["service"], job["user_uid"], job["generation_name"])
+    redis_client.set(key, json.dumps(job), ex=CHECKPOINT_TTL)
+
+def load_checkpoint(service: str, user_uid: str, generation_name: str):
+    """Devuelve el último job guardado para la generación, o None si no hay checkpoint."""
+    data = redis_client.get(_checkpoint_key(service, user_uid, generation_name))
+    return json.loads(data) if data else None
+
+def delete_checkpoint(job: dict):
+    redis_client.delete(_checkpoint_key(job["service"], job["user_uid"], job["generation_name"]))
+
+def checkpoint_paths(value) -> list:
+    """Rutas locales contenidas en la salida de un paso (str, lista o dict anidados)."""
+    if isinstance(value, str):
+        return [value] if os.path.isabs(value) else []
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [path for item in value for path in checkpoint_paths(item)]
+    return []
+
+def outputs_available(value) -> bool:
+    """Un paso solo se puede reutilizar si todos sus archivos siguen en disco."""
+    return all(os.path.exists(path) for path in checkpoint_paths(value))
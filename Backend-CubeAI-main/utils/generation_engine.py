@@ -0,0 +1,26 @@
+import asyncio
+
+# Cada generación ejecuta la corrutina de su sesión en el Space en un event loop propio, dentro
+# del hilo del worker de Celery que la lanzó, y ese hilo espera hasta que la sesión termina.
+# Las generaciones simultáneas por proceso son, por tanto, los hilos del worker de la cola
+# remote_gpu (--pool threads --concurrency CELERY_GPU_CONCURRENCY en el Procfile): un hilo
+# esperando al Space apenas consume CPU ni memoria, así que la concurrencia se dimensiona con el
+# número de sesiones que admiten los Spaces (SPACE_CONCURRENCY_LIMIT) y no con los núcleos.
+# El loop de cada generación permite solapar llamadas dentro de la sesión (p. ej. la subida de la
+# previsualización mientras se extrae el GLB); lo bloqueante se delega con asyncio.to_thread.
+
+async def space_call(client, *args, api_name: str, **kwargs):
+    """
+    Envía una llamada al Space con client.submit() y espera el Job sin bloquear el event loop.
+    Equivale a client.predict(*args, api_name=api_name, **kwargs).
+    """
+    job = client.submit(*args, api_name=api_name, **kwargs)
+    try:
+        return await asyncio.wrap_future(job)
+    except asyncio.CancelledError:
+        job.cancel()
+        raise
+
+def run_generation(coro):
+    """Ejecuta la corrutina de una generación en un event loop propio y devuelve su resultado (bloquea el hilo)."""
+    return asyncio.run(coro)
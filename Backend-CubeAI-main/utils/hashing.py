@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+
+# Las entradas del staging se referencian por su contenido: 'staged:{sha256}{extensión}'.
+STAGED_PREFIX = "staged:"
+
+# Las subidas directas al bucket llevan el hash de su contenido tras la referencia:
+# 'gs://bucket/objeto#md5={hex}' (o '#sha256={hex}'), porque el nombre del objeto es aleatorio.
+UPLOAD_DIGEST_SEPARATOR = "#"
+
+def is_staged_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(STAGED_PREFIX)
+
+def staged_digest(ref: str) -> str:
+    """SHA-256 del contenido de una entrada del staging (el mismo que file_digest del archivo)."""
+    return ref[len(STAGED_PREFIX):].split(".", 1)[0]
+
+def with_upload_digest(ref: str, algorithm: str, digest: str) -> str:
+    return f"{ref}{UPLOAD_DIGEST_SEPARATOR}{algorithm}={digest}"
+
+def upload_digest(value):
+    """(algoritmo, hash) del contenido de una subida directa, o None si la referencia no lo lleva."""
+    if not isinstance(value, str) or not value.startswith("gs://") or UPLOAD_DIGEST_SEPARATOR not in value:
+        return None
+    algorithm, _, digest = value.rsplit(UPLOAD_DIGEST_SEPARATOR, 1)[1].partition("=")
+    if algorithm not in ("md5", "sha256") or not digest:
+        return None
+    return algorithm, digest
+
+def file_digest(path: str) -> str:
+    """SHA-256 del contenido de un archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint_inputs(inputs: dict) -> dict:
+    """
+    Representación estable de las entradas de una generación: los archivos ('*_path')
+    se identifican por su contenido y no por su ruta temporal, su clave en el staging ni
+    el nombre aleatorio de su subida directa.
+    """
+    fingerprint = {}
+    for key, value in inputs.items():
+        if key.endswith("_path") and is_staged_ref(value):
+            value = {"sha256": staged_digest(value)}
+        elif key.endswith("_path") and upload_digest(value):
+            algorithm, digest = upload_digest(value)
+            value = {algorithm: digest}
+        elif key.endswith("_path") and isinstance(value, str) and os.path.exists(value):
+            value = {"sha256": file_digest(value)}
+        fingerprint[key] = value
+    return fingerprint
+
+def digest_json(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+import multiprocessing
+import os
+import threading
+import uuid
+
+# Normalización de las imágenes de entrada antes de enviarlas a los Spaces: se decodifican, se
+# orientan según EXIF, se reducen a la resolución de trabajo del Space y se recodifican sin
+# metadatos. Se ejecuta en un pool de procesos para no ocupar el GIL de los hilos del worker.
+IMAGE_NORMALIZE_WORKERS = int(os.getenv("IMAGE_NORMALIZE_WORKERS", "2"))
+IMAGE_NORMALIZE_JPEG_QUALITY = int(os.getenv("IMAGE_NORMALIZE_JPEG_QUALITY", "92"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn': el worker de Celery es multihilo y hacer fork desde él puede bloquear los hijos.
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_NORMALIZE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _has_alpha(image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+def _normalize(source_path: str, destination_base: str, max_side: int, jpeg_quality: int) -> str:
+    """Se ejecuta en el proceso hijo. Las imágenes con transparencia se guardan en PNG y el resto en JPEG."""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if _has_alpha(image):
+            image, extension, options = image.convert("RGBA"), ".png", {"format": "PNG", "optimize": True}
+        else:
+            image, extension = image.convert("RGB"), ".jpg"
+            options = {"format": "JPEG", "quality": jpeg_quality, "optimize": True}
+        destination_path = destination_base + extension
+        tmp_path = f"{destination_base}.{uuid.uuid4().hex}.tmp"
+        image.save(tmp_path, **options)
+    os.replace(tmp_path, destination_path)
+    return destination_path
+
+def normalized_path(destination_base: str):
+    """Resultado ya normalizado para 'destination_base' (la extensión depende de la imagen), o None."""
+    for extension in (".png", ".jpg"):
+        if os.path.exists(destination_base + extension):
+            return destination_base + extension
+    return None
+
+def normalize_image(source_path: str, destination_base: str, max_side: int) -> str:
+    """
+    Normaliza la imagen en el pool de procesos (bloquea al llamador hasta que termina).
+    Raises:
+        ValueError: Si el archivo no es una imagen que se pueda decodificar.
+    Returns:
+        str: Ruta de la imagen normalizada ('destination_base' más '.png' o '.jpg').
+    """
+    future = _get_pool().submit(_normalize, source_path, destination_base, max_side, IMAGE_NORMALIZE_JPEG_QUALITY)
+    try:
+        return future.result()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"La imagen de entrada no es válida: {e}") from e
@@ -0,0 +1,156 @@
+from config.firebase_config import bucket
+from config.redis_config import redis_binary_client
+from utils.hashing import STAGED_PREFIX
+from utils.input_uploads import UPLOAD_RETENTION_DAYS
+from utils.storage_utils import ensure_custom_time_expiry
+import datetime
+import hashlib
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+# Almacén compartido de las entradas de las generaciones, direccionado por contenido: la web
+# guarda cada archivo una sola vez bajo su SHA-256 y los workers lo leen por esa clave, con una
+# caché local de lectura. Dos subidas idénticas comparten la misma entrada.
+#   bucket    -> objetos 'staging/{hash}' (caducan con una regla de ciclo de vida sobre customTime).
+#   redis     -> claves 'input-staging:{hash}' con TTL (entradas pequeñas, sin bucket).
+#   directory -> archivos en INPUT_STAGING_DIR, que debe ser un directorio compartido entre nodos.
+INPUT_STAGING_BACKEND = os.getenv("INPUT_STAGING_BACKEND", "bucket")
+INPUT_STAGING_DIR = os.getenv("INPUT_STAGING_DIR", os.path.join(tempfile.gettempdir(), "cubeai-staging"))
+INPUT_STAGING_TTL = int(os.getenv("INPUT_STAGING_TTL", str(24 * 3600)))
+INPUT_CACHE_DIR = os.getenv("INPUT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cubeai-input-cache"))
+INPUT_CACHE_TTL = int(os.getenv("INPUT_CACHE_TTL", "3600"))
+INPUT_CACHE_SWEEP_INTERVAL = int(os.getenv("INPUT_CACHE_SWEEP_INTERVAL", "300"))
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]{1,8})?$")
+_REDIS_PREFIX = "input-staging:"
+_BUCKET_PREFIX = "staging/"
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+def ensure_expiry_rule():
+    """
+    Comprueba al arrancar que el bucket tiene la regla que borra por customTime los objetos del
+    staging y las subidas directas, para que caduquen aunque no se pida ninguna URL de subida.
+    """
+    days = max(UPLOAD_RETENTION_DAYS, math.ceil(INPUT_STAGING_TTL / 86400))
+    try:
+        ensure_custom_time_expiry(days)
+    except Exception as e:
+        print(f"No se pudo comprobar la regla de caducidad del bucket: {e}")
+
+def _key(ref: str) -> str:
+    key = ref[len(STAGED_PREFIX):]
+    if not _KEY_PATTERN.match(key):
+        raise ValueError(f"Referencia de staging no válida: {ref}")
+    return key
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _store(key: str, data: bytes, content_type: str):
+    """Guarda la entrada si no existe; si existe, renueva su caducidad."""
+    if INPUT_STAGING_BACKEND == "redis":
+        redis_key = _REDIS_PREFIX + key
+        if not redis_binary_client.set(redis_key, data, ex=INPUT_STAGING_TTL, nx=True):
+            redis_binary_client.expire(redis_key, INPUT_STAGING_TTL)
+    elif INPUT_STAGING_BACKEND == "directory":
+        os.makedirs(INPUT_STAGING_DIR, exist_ok=True)
+        path = os.path.join(INPUT_STAGING_DIR, key)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            _write_atomic(path, data)
+    else:
+        blob = bucket.blob(_BUCKET_PREFIX + key)
+        blob.custom_time = datetime.datetime.now(datetime.timezone.utc)
+        if blob.exists():
+            blob.patch()
+        else:
+            blob.upload_from_string(data, content_type=content_type)
+
+def _load(key: str, destination_path: str):
+    """Descarga la entrada a 'destination_path'. Raises: FileNotFoundError si ya caducó."""
+    if INPUT_STAGING_BACKEND == "redis":
+        data = redis_binary_client.get(_REDIS_PREFIX + key)
+        if data is None:
+            raise FileNotFoundError(f"La entrada {key} ya no está en el staging.")
+        _write_atomic(destination_path, data)
+    elif INPUT_STAGING_BACKEND == "directory":
+        with open(os.path.join(INPUT_STAGING_DIR, key), "rb") as f:
+            _write_atomic(destination_path, f.read())
+    else:
+        blob = bucket.blob(_BUCKET_PREFIX + key)
+        if not blob.exists():
+            raise FileNotFoundError(f"La entrada {key} ya no está en el staging.")
+        tmp_path = f"{destination_path}.{uuid.uuid4().hex}.tmp"
+        blob.download_to_filename(tmp_path)
+        os.replace(tmp_path, destination_path)
+
+def stage_upload(file_storage) -> str:
+    """
+    Guarda en el staging un archivo recibido en la petición.
+    Returns:
+        str: Referencia 'staged:{sha256}{extensión}' que viaja en las entradas del job.
+    """
+    data = file_storage.read()
+    extension = os.path.splitext(file_storage.filename or "")[1].lower()
+    if not re.match(r"^\.[a-z0-9]{1,8}$", extension):
+        extension = ""
+    key = hashlib.sha256(data).hexdigest() + extension
+    _store(key, data, file_storage.mimetype or "application/octet-stream")
+    return STAGED_PREFIX + key
+
+def fetch(ref: str) -> str:
+    """
+    Ruta local de una entrada del staging. La caché local es compartida por todos los jobs del
+    nodo (el contenido no cambia para una misma clave) y sus archivos se purgan por antigüedad.
+    """
+    key = _key(ref)
+    os.makedirs(INPUT_CACHE_DIR, exist_ok=True)
+    path = os.path.join(INPUT_CACHE_DIR, key)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        _load(key, path)
+    _maybe_sweep()
+    return path
+
+def _sweep_directory(directory: str, ttl: int) -> int:
+    removed = 0
+    cutoff = time.time() - ttl
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # Otro proceso ya lo borró o lo está usando.
+    return removed
+
+def sweep() -> int:
+    """Borra las entradas caducadas de la caché local (y del directorio compartido). Returns: archivos borrados."""
+    removed = _sweep_directory(INPUT_CACHE_DIR, INPUT_CACHE_TTL)
+    if INPUT_STAGING_BACKEND == "directory":
+        removed += _sweep_directory(INPUT_STAGING_DIR, INPUT_STAGING_TTL)
+    return removed
+
+def _maybe_sweep():
+    global _last_sweep
+    with _sweep_lock:
+        if time.monotonic() - _last_sweep < INPUT_CACHE_SWEEP_INTERVAL:
+            return
+        _last_sweep = time.monotonic()
+    sweep()
@@ -0,0 +1,76 @@
+from config.firebase_config import bucket
+from google.cloud.exceptions import NotFound
+from utils.storage_utils import create_upload_url, storage_ref, is_storage_ref, ref_blob_name
+from utils.hashing import with_upload_digest
+import base64
+import hashlib
+import os
+import uuid
+
+# Subida directa de las imágenes de entrada al bucket: el cliente pide URLs firmadas, sube los
+# bytes con PUT y encola la generación con las referencias, sin pasar las imágenes por Flask.
+UPLOAD_URL_TTL = int(os.getenv("UPLOAD_URL_TTL", "900"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CONTENT_TYPES = ("image/png", "image/jpeg", "image/webp")
+MAX_UPLOADS_PER_REQUEST = 3
+# Las subidas se borran al guardar la generación o al descartarse la petición; las abandonadas
+# (o de generaciones fallidas que no se reanudan) las borra la regla de caducidad sobre customTime,
+# que input_staging.ensure_expiry_rule comprueba al arrancar la app.
+UPLOAD_RETENTION_DAYS = int(os.getenv("UPLOAD_RETENTION_DAYS", "1"))
+
+def _upload_prefix(user_uid: str) -> str:
+    # Bajo '{uid}/' para que el borrado de la cuenta también las elimine.
+    return f"{user_uid}/uploads/"
+
+def create_upload_urls(user_uid: str, content_types: list) -> list:
+    """
+    Reserva un objeto por imagen y devuelve su URL de subida firmada.
+    Raises:
+        ValueError: Si se piden demasiadas subidas o un tipo de contenido no admitido.
+    Returns:
+        list: [{'object_name': ..., 'upload_url': ..., 'headers': {...}}], en el mismo orden.
+    """
+    if not content_types or len(content_types) > MAX_UPLOADS_PER_REQUEST:
+        raise ValueError(f"Se pueden solicitar entre 1 y {MAX_UPLOADS_PER_REQUEST} subidas por petición.")
+    uploads = []
+    for content_type in content_types:
+        if content_type not in UPLOAD_CONTENT_TYPES:
+            raise ValueError(f"Tipo de archivo no admitido: {content_type}")
+        object_name = f"{_upload_prefix(user_uid)}{uuid.uuid4().hex}"
+        upload = create_upload_url(object_name, content_type, UPLOAD_MAX_BYTES, UPLOAD_URL_TTL)
+        uploads.append(dict(upload, object_name=object_name))
+    return uploads
+
+def resolve_upload(user_uid: str, object_name: str) -> str:
+    """
+    Comprueba que el objeto subido pertenece al usuario y es una imagen válida.
+    Raises:
+        ValueError: Si el objeto no es del usuario, no existe o no cumple los límites.
+    Returns:
+        str: Referencia 'gs://' con el hash del contenido ('#md5=...'), que se guarda en las
+        entradas del job: dos subidas de los mismos bytes comparten caché de resultados y single-flight.
+    """
+    if not isinstance(object_name, str) or not object_name.startswith(_upload_prefix(user_uid)) \
+            or "/" in object_name[len(_upload_prefix(user_uid)):]:
+        raise ValueError("La referencia del archivo subido no es válida.")
+    blob = bucket.get_blob(object_name)
+    if blob is None:
+        raise ValueError("El archivo subido no existe o la subida no ha terminado.")
+    if blob.content_type not in UPLOAD_CONTENT_TYPES or (blob.size or 0) > UPLOAD_MAX_BYTES:
+        raise ValueError("El archivo subido no es una imagen admitida.")
+    if blob.md5_hash:
+        return with_upload_digest(storage_ref(object_name), "md5", base64.b64decode(blob.md5_hash).hex())
+    # Los objetos compuestos no tienen MD5: se calcula el SHA-256 de su contenido.
+    return with_upload_digest(storage_ref(object_name), "sha256", hashlib.sha256(blob.download_as_bytes()).hexdigest())
+
+def discard_uploads(inputs: dict):
+    """Borra del bucket las subidas directas referenciadas en las entradas de una generación."""
+    for value in inputs.values():
+        if not is_storage_ref(value) or "/uploads/" not in ref_blob_name(value):
+            continue
+        try:
+            bucket.blob(ref_blob_name(value)).delete()
+        except NotFound:
+            pass
+        except Exception as e:
+            print(f"Error al borrar la entrada subida {value}: {e}")
@@ -0,0 +1,98 @@
+from config.redis_config import redis_client
+from utils.hashing import digest_json
+import json
+import os
+import time
+
+LISTING_CACHE_ENABLED = os.getenv("LISTING_CACHE_ENABLED", "true").lower() == "true"
+LISTING_CACHE_TTL = int(os.getenv("LISTING_CACHE_TTL", "600"))
+
+# Cada (usuario, colección) tiene un número de versión que se incrementa en cada escritura.
+# Las entradas se guardan bajo la versión vigente, así que invalidar es un INCR y las entradas
+# antiguas simplemente dejan de consultarse hasta que caducan.
+_VERSION_PREFIX = "listing-cache:version:"
+_ENTRY_PREFIX = "listing-cache:entry:"
+_HITS_KEY = "listing-cache:hits"
+_MISSES_KEY = "listing-cache:misses"
+_INVALIDATIONS_KEY = "listing-cache:invalidations"
+_HIT_AGE_SUM_KEY = "listing-cache:hit-age-sum"
+_HIT_AGE_MAX_KEY = "listing-cache:hit-age-max"
+
+_MAX_AGE_SCRIPT = redis_client.register_script("""
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+""")
+
+def _scope(user_uid: str, collection_name: str) -> str:
+    return f"{user_uid}:{collection_name}"
+
+def get_listing(user_uid: str, collection_name: str, params: dict, loader):
+    """
+    Devuelve el listado de la caché o lo carga con loader() y lo guarda.
+    Args:
+        params (dict): Parámetros de la consulta (página, cursor, campos); forman parte de la clave.
+        loader (callable): Lee el listado de Firestore.
+    """
+    if not LISTING_CACHE_ENABLED:
+        return loader()
+
+    scope = _scope(user_uid, collection_name)
+    try:
+        version = redis_client.get(_VERSION_PREFIX + scope) or "0"
+        entry_key = f"{_ENTRY_PREFIX}{scope}:{version}:{digest_json(params)}"
+        data = redis_client.get(entry_key)
+    except Exception as e:
+        print(f"Error al leer la caché de listados: {e}")
+        return loader()
+
+    if data is not None:
+        entry = json.loads(data)
+        age = time.time() - entry["stored_at"]
+        pipe = redis_client.pipeline()
+        pipe.incr(_HITS_KEY)
+        pipe.incrbyfloat(_HIT_AGE_SUM_KEY, age)
+        pipe.execute()
+        _MAX_AGE_SCRIPT(keys=[_HIT_AGE_MAX_KEY], args=[age])
+        return entry["items"]
+
+    redis_client.incr(_MISSES_KEY)
+    items = loader()
+    try:
+        redis_client.set(entry_key, json.dumps({"stored_at": time.time(), "items": items}, default=str), ex=LISTING_CACHE_TTL)
+    except Exception as e:
+        print(f"Error al guardar en la caché de listados: {e}")
+    return items
+
+def invalidate(user_uid: str, collection_name: str):
+    """Invalida todos los listados (todas las páginas y vistas) de la colección del usuario."""
+    if not LISTING_CACHE_ENABLED:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.incr(_VERSION_PREFIX + _scope(user_uid, collection_name))
+        pipe.expire(_VERSION_PREFIX + _scope(user_uid, collection_name), LISTING_CACHE_TTL * 2)
+        pipe.incr(_INVALIDATIONS_KEY)
+        pipe.execute()
+    except Exception as e:
+        print(f"Error al invalidar la caché de listados: {e}")
+
+def get_stats() -> dict:
+    hits, misses, invalidations, age_sum, age_max = redis_client.mget(
+        _HITS_KEY, _MISSES_KEY, _INVALIDATIONS_KEY, _HIT_AGE_SUM_KEY, _HIT_AGE_MAX_KEY
+    )
+    hits, misses, invalidations = int(hits or 0), int(misses or 0), int(invalidations or 0)
+    total = hits + misses
+    return {
+        "enabled": LISTING_CACHE_ENABLED,
+        "ttl": LISTING_CACHE_TTL,
+        "hits": hits,
+        "misses": misses,
+        "invalidations": invalidations,
+        "hit_ratio": hits / total if total else 0.0,
+        # Antigüedad (segundos) de las entradas servidas: cuánto pueden ir por detrás de Firestore
+        # si una escritura no pasara por la invalidación.
+        "mean_hit_age": float(age_sum or 0) / hits if hits else 0.0,
+        "max_hit_age": float(age_max or 0),
+    }
@@ -0,0 +1,82 @@
+from config.redis_config import redis_client
+from utils.hashing import fingerprint_inputs, digest_json
+import json
+import os
+import time
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+
+_ENTRY_PREFIX = "result-cache:entry:"
+_FOLDER_PREFIX = "result-cache:folder:"
+_LRU_KEY = "result-cache:lru"
+_HITS_KEY = "result-cache:hits"
+_MISSES_KEY = "result-cache:misses"
+_EVICTIONS_KEY = "result-cache:evictions"
+
+def compute_cache_key(service: str, space_url: str, inputs: dict, pipeline_params: dict) -> str:
+    """Clave de contenido: hash de las entradas (bytes o texto) más los parámetros del pipeline y el Space."""
+    return digest_json({
+        "service": service,
+        "space_url": space_url,
+        "inputs": fingerprint_inputs(inputs),
+        "pipeline_params": pipeline_params,
+    })
+
+def get_cached_result(cache_key: str):
+    """
+    Devuelve la entrada de la caché ({'folder': ..., 'artifacts': [...]}) o None.
+    Cada consulta actualiza su posición LRU y los contadores de aciertos/fallos.
+    """
+    data = redis_client.get(_ENTRY_PREFIX + cache_key)
+    if data is None:
+        redis_client.incr(_MISSES_KEY)
+        return None
+    redis_client.zadd(_LRU_KEY, {cache_key: time.time()})
+    redis_client.incr(_HITS_KEY)
+    return json.loads(data)
+
+def store_result(cache_key: str, folder: str, artifacts: list):
+    """Registra los artefactos subidos de una generación y aplica la política de expulsión LRU."""
+    entry = json.dumps({"folder": folder, "artifacts": artifacts})
+    pipe = redis_client.pipeline()
+    pipe.set(_ENTRY_PREFIX + cache_key, entry, ex=RESULT_CACHE_TTL)
+    pipe.set(_FOLDER_PREFIX + folder, cache_key, ex=RESULT_CACHE_TTL)
+    pipe.zadd(_LRU_KEY, {cache_key: time.time()})
+    pipe.execute()
+
+    overflow = redis_client.zcard(_LRU_KEY) - RESULT_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        for evicted_key, _ in redis_client.zpopmin(_LRU_KEY, overflow):
+            evict(evicted_key)
+
+def evict(cache_key: str):
+    data = redis_client.get(_ENTRY_PREFIX + cache_key)
+    pipe = redis_client.pipeline()
+    if data:
+        pipe.delete(_FOLDER_PREFIX + json.loads(data)["folder"])
+    pipe.delete(_ENTRY_PREFIX + cache_key)
+    pipe.zrem(_LRU_KEY, cache_key)
+    pipe.incr(_EVICTIONS_KEY)
+    pipe.execute()
+
+def invalidate_folder(folder: str):
+    """Expulsa la entrada cuyos artefactos viven en la carpeta indicada (p. ej. al borrar la generación)."""
+    cache_key = redis_client.get(_FOLDER_PREFIX + folder)
+    if cache_key:
+        evict(cache_key)
+
+def get_stats() -> dict:
+    hits, misses, evictions = redis_client.mget(_HITS_KEY, _MISSES_KEY, _EVICTIONS_KEY)
+    hits, misses, evictions = int(hits or 0), int(misses or 0), int(evictions or 0)
+    total = hits + misses
+    return {
+        "enabled": RESULT_CACHE_ENABLED,
+        "entries": redis_client.zcard(_LRU_KEY),
+        "max_entries": RESULT_CACHE_MAX_ENTRIES,
+        "hits": hits,
+        "misses": misses,
+        "evictions": evictions,
+        "hit_ratio": hits / total if total else 0.0,
+    }
@@ -0,0 +1,215 @@
+from config.redis_config import redis_client
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+# Espacio de trabajo en disco de cada job (entradas descargadas y salidas de los Spaces).
+# Cada job tiene su directorio con cuota, que se borra entero al terminar la subida. La raíz es
+# local del nodo: solo la usa el worker que ejecuta la etapa Space (que también sube sus salidas)
+# y nunca se lee desde otra cola. Por defecto va al directorio temporal del sistema; tmpfs
+# (/dev/shm) es memoria, así que solo se usa si cabe la cuota de todos los jobs simultáneos del
+# worker (SCRATCH_JOB_QUOTA_BYTES x CELERY_GPU_CONCURRENCY) o si se indica con SCRATCH_ROOT.
+# Cada proceso registra en Redis los directorios que está usando (con TTL renovado por su
+# janitor), de modo que los janitors de otros procesos del nodo no los tomen por huérfanos.
+SCRATCH_JOB_QUOTA_BYTES = int(os.getenv("SCRATCH_JOB_QUOTA_BYTES", str(2 * 1024 ** 3)))
+
+def _default_root() -> str:
+    needed = SCRATCH_JOB_QUOTA_BYTES * int(os.getenv("CELERY_GPU_CONCURRENCY", "32"))
+    try:
+        fits_in_memory = SCRATCH_JOB_QUOTA_BYTES > 0 and os.access("/dev/shm", os.W_OK) \
+            and shutil.disk_usage("/dev/shm").free >= needed
+    except OSError:
+        fits_in_memory = False
+    if fits_in_memory:
+        return "/dev/shm/cubeai-scratch"
+    return os.path.join(tempfile.gettempdir(), "cubeai-scratch")
+
+SCRATCH_ROOT = os.getenv("SCRATCH_ROOT") or _default_root()
+SCRATCH_ORPHAN_TTL = int(os.getenv("SCRATCH_ORPHAN_TTL", str(6 * 3600)))
+SCRATCH_JANITOR_INTERVAL = int(os.getenv("SCRATCH_JANITOR_INTERVAL", "300"))
+
+_STATS_PREFIX = "scratch-stats:"
+_LEASE_PREFIX = "scratch-lease:"
+
+_lock = threading.Lock()
+_active = {}  # Directorio -> número de usos en este proceso.
+_janitor = None
+_counters = {"created": 0, "released": 0, "orphans_removed": 0, "quota_exceeded": 0}
+
+class ScratchQuotaExceeded(RuntimeError):
+    """El job ha superado la cuota de disco de su espacio de trabajo."""
+
+def workspace_path(job: dict) -> str:
+    key = job.get("tracking_id") or f'{job["user_uid"]}-{job["service"]}-{job["generation_name"]}'
+    return os.path.join(SCRATCH_ROOT, "".join(c if c.isalnum() or c in "-_" else "_" for c in key))
+
+def _lease_key(path: str) -> str:
+    return f"{_LEASE_PREFIX}{socket.gethostname()}:{os.path.basename(path)}"
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _lease_ttl() -> int:
+    return max(SCRATCH_JANITOR_INTERVAL * 3, 60)
+
+def acquire(job: dict) -> str:
+    """
+    Crea (o reutiliza) el espacio de trabajo del job y lo registra como activo en este proceso,
+    para que ningún janitor lo considere huérfano mientras se usa.
+    Returns:
+        str: Ruta del directorio, también guardada en job['workspace'].
+    """
+    _start_janitor()
+    path = job.get("workspace") or workspace_path(job)
+    os.makedirs(path, exist_ok=True)
+    with _lock:
+        if path not in _active:
+            _counters["created"] += 1
+        _active[path] = _active.get(path, 0) + 1
+    redis_client.set(_lease_key(path), _owner(), ex=_lease_ttl())
+    job["workspace"] = path
+    return path
+
+def release(job: dict, remove: bool = False):
+    """Deja de usar el espacio de trabajo; con remove=True lo borra entero (fin del job)."""
+    path = job.get("workspace")
+    if not path:
+        return
+    with _lock:
+        uses = _active.get(path, 0) - 1
+        if uses > 0:
+            _active[path] = uses
+        else:
+            _active.pop(path, None)
+    if uses <= 0:
+        redis_client.delete(_lease_key(path))
+    if remove:
+        shutil.rmtree(path, ignore_errors=True)
+        job["workspace"] = None
+        with _lock:
+            _counters["released"] += 1
+
+def usage(path: str) -> int:
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(directory, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def check_quota(job: dict):
+    """Raises: ScratchQuotaExceeded si el espacio de trabajo del job supera SCRATCH_JOB_QUOTA_BYTES."""
+    path = job.get("workspace")
+    if not path or SCRATCH_JOB_QUOTA_BYTES <= 0:
+        return
+    used = usage(path)
+    if used > SCRATCH_JOB_QUOTA_BYTES:
+        with _lock:
+            _counters["quota_exceeded"] += 1
+        raise ScratchQuotaExceeded(
+            f"La generación ocupa {used} bytes en disco, por encima de la cuota de {SCRATCH_JOB_QUOTA_BYTES}.")
+
+def _last_activity(path: str) -> float:
+    latest = os.path.getmtime(path)
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                latest = max(latest, os.lstat(os.path.join(directory, name)).st_mtime)
+            except OSError:
+                pass
+    return latest
+
+def sweep() -> int:
+    """
+    Borra los espacios de trabajo del nodo sin dueño en Redis y sin actividad desde hace
+    SCRATCH_ORPHAN_TTL. Cada janitor renueva la concesión de los directorios de su proceso,
+    así que solo caducan los de procesos muertos o los ya liberados (que se conservan ese
+    tiempo para poder reanudar la subida en este nodo).
+    Returns:
+        int: Directorios borrados.
+    """
+    with _lock:
+        active = list(_active)
+    if active:
+        pipe = redis_client.pipeline()
+        for path in active:
+            pipe.set(_lease_key(path), _owner(), ex=_lease_ttl())
+        pipe.execute()
+
+    removed = 0
+    cutoff = time.time() - SCRATCH_ORPHAN_TTL
+    try:
+        entries = [entry.path for entry in os.scandir(SCRATCH_ROOT) if entry.is_dir()]
+    except FileNotFoundError:
+        return 0
+    candidates = [path for path in entries if path not in active]
+    leased = redis_client.mget([_lease_key(path) for path in candidates]) if candidates else []
+    for path, owner in zip(candidates, leased):
+        if owner is not None:
+            continue  # Lo está usando otro proceso del nodo.
+        try:
+            if _last_activity(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            pass
+    if removed:
+        print(f"Janitor: {removed} espacios de trabajo huérfanos eliminados de {SCRATCH_ROOT}.")
+        with _lock:
+            _counters["orphans_removed"] += removed
+    return removed
+
+def get_local_stats() -> dict:
+    """Uso del espacio de trabajo en este nodo y contadores de este proceso."""
+    try:
+        workspaces = [entry.path for entry in os.scandir(SCRATCH_ROOT) if entry.is_dir()]
+        disk = shutil.disk_usage(SCRATCH_ROOT)
+    except FileNotFoundError:
+        workspaces, disk = [], None
+    with _lock:
+        stats = dict(_counters, active=len(_active))
+    stats.update({
+        "root": SCRATCH_ROOT,
+        "workspaces": len(workspaces),
+        "used_bytes": sum(usage(path) for path in workspaces),
+        "free_bytes": disk.free if disk else None,
+        "total_bytes": disk.total if disk else None,
+        "job_quota_bytes": SCRATCH_JOB_QUOTA_BYTES,
+    })
+    return stats
+
+def _publish_stats():
+    key = f"{_STATS_PREFIX}{socket.gethostname()}:{os.getpid()}"
+    redis_client.set(key, json.dumps(get_local_stats()), ex=SCRATCH_JANITOR_INTERVAL * 3)
+
+def get_stats() -> dict:
+    """Últimas estadísticas publicadas por cada proceso worker (nodo:pid -> stats)."""
+    keys = list(redis_client.scan_iter(match=_STATS_PREFIX + "*"))
+    values = redis_client.mget(keys) if keys else []
+    return {key[len(_STATS_PREFIX):]: json.loads(value) for key, value in zip(keys, values) if value}
+
+def _start_janitor():
+    global _janitor
+    if SCRATCH_JANITOR_INTERVAL <= 0:
+        return
+    with _lock:
+        if _janitor is not None:
+            return
+
+        def janitor_loop():
+            while True:
+                try:
+                    sweep()
+                    _publish_stats()
+                except Exception as e:
+                    print(f"Error en el janitor del espacio de trabajo: {e}")
+                time.sleep(SCRATCH_JANITOR_INTERVAL)
+
+        _janitor = threading.Thread(target=janitor_loop, name="scratch-janitor", daemon=True)
+        _janitor.start()
@@ -0,0 +1,40 @@
+from config.redis_config import redis_client
+from utils.hashing import fingerprint_inputs, digest_json
+import os
+
+INFLIGHT_TTL = int(os.getenv("INFLIGHT_TTL", "3600"))
+
+_KEY_PREFIX = "inflight:"
+
+# Borra la clave solo si sigue apuntando a la misma tarea.
+_release_script = redis_client.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+
+def inflight_key(service: str, user_uid: str, generation_name: str, inputs: dict) -> str:
+    return _KEY_PREFIX + digest_json({
+        "service": service,
+        "user_uid": user_uid,
+        "generation_name": generation_name,
+        "inputs": fingerprint_inputs(inputs),
+    })
+
+def claim(key: str, task_id: str):
+    """
+    Registra task_id como la ejecución en curso para la clave.
+    Returns:
+        str | None: None si se ha registrado; si ya había una tarea en curso, su task_id.
+    """
+    if redis_client.set(key, task_id, nx=True, ex=INFLIGHT_TTL):
+        return None
+    existing = redis_client.get(key)
+    # La clave pudo expirar entre SET y GET: se reintenta una vez.
+    if existing is None and redis_client.set(key, task_id, nx=True, ex=INFLIGHT_TTL):
+        return None
+    return existing
+
+def release(key: str, task_id: str):
+    _release_script(keys=[key], args=[task_id])
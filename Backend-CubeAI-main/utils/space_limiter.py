@@ -0,0 +1,160 @@
+from config.redis_config import redis_client
+from contextlib import contextmanager
+from utils.hashing import digest_json
+import json
+import os
+import threading
+import time
+
+# Número máximo de sesiones simultáneas contra cada Space, compartido por todos los workers.
+# SPACE_CONCURRENCY_LIMITS permite ajustar Spaces concretos: '{"https://...": 1}'.
+SPACE_CONCURRENCY_LIMIT = int(os.getenv("SPACE_CONCURRENCY_LIMIT", "2"))
+SPACE_CONCURRENCY_LIMITS = json.loads(os.getenv("SPACE_CONCURRENCY_LIMITS", "{}"))
+SPACE_SLOT_TTL = int(os.getenv("SPACE_SLOT_TTL", "120"))
+SPACE_ADMISSION_TIMEOUT = float(os.getenv("SPACE_ADMISSION_TIMEOUT", "1800"))
+SPACE_ADMISSION_POLL_INTERVAL = float(os.getenv("SPACE_ADMISSION_POLL_INTERVAL", "2"))
+
+# Semáforo justo: 'holders' guarda los tickets con plaza (score = caducidad) y 'queue' los que
+# esperan por orden de llegada. 'seen' es el último sondeo de cada ticket en cola, para purgar
+# los de workers que murieron esperando. Todo con el reloj de Redis, no el de cada worker.
+# Devuelve 0 si el ticket obtiene plaza, o su posición (1, 2, ...) en la cola de admisión.
+_ACQUIRE_SCRIPT = redis_client.register_script("""
+local now = tonumber(redis.call('TIME')[1])
+local ticket = ARGV[1]
+local limit = tonumber(ARGV[2])
+local slot_ttl = tonumber(ARGV[3])
+local waiter_ttl = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+for _, dead in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - waiter_ttl)) do
+    redis.call('ZREM', KEYS[2], dead)
+    redis.call('ZREM', KEYS[3], dead)
+end
+
+if redis.call('ZSCORE', KEYS[1], ticket) then
+    redis.call('ZADD', KEYS[1], now + slot_ttl, ticket)
+    return 0
+end
+
+redis.call('ZADD', KEYS[2], 'NX', now, ticket)
+redis.call('ZADD', KEYS[3], now, ticket)
+local rank = redis.call('ZRANK', KEYS[2], ticket)
+local free = limit - redis.call('ZCARD', KEYS[1])
+if rank < free then
+    redis.call('ZREM', KEYS[2], ticket)
+    redis.call('ZREM', KEYS[3], ticket)
+    redis.call('ZADD', KEYS[1], now + slot_ttl, ticket)
+    return 0
+end
+return rank - math.max(free, 0) + 1
+""")
+
+_REFRESH_SCRIPT = redis_client.register_script("""
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    local now = tonumber(redis.call('TIME')[1])
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+    return 1
+end
+return 0
+""")
+
+_FREE_SLOTS_SCRIPT = redis_client.register_script("""
+local now = tonumber(redis.call('TIME')[1])
+local active = redis.call('ZCOUNT', KEYS[1], '(' .. now, '+inf')
+return tonumber(ARGV[1]) - active - redis.call('ZCARD', KEYS[2])
+""")
+
+class AdmissionAbandoned(Exception):
+    """El job dejó la cola de admisión antes de obtener plaza."""
+
+def get_limit(space_url: str) -> int:
+    return int(SPACE_CONCURRENCY_LIMITS.get(space_url, SPACE_CONCURRENCY_LIMIT))
+
+def _keys(space_url: str) -> list:
+    prefix = f"space-limiter:{digest_json(space_url)[:16]}"
+    return [f"{prefix}:holders", f"{prefix}:queue", f"{prefix}:seen"]
+
+def try_acquire(space_url: str, ticket: str) -> int:
+    """Intenta ocupar una plaza. Returns: 0 si la obtiene, o la posición en la cola de admisión."""
+    waiter_ttl = max(SPACE_ADMISSION_POLL_INTERVAL * 10, 30)
+    return int(_ACQUIRE_SCRIPT(
+        keys=_keys(space_url),
+        args=[ticket, get_limit(space_url), SPACE_SLOT_TTL, int(waiter_ttl)],
+    ))
+
+def release(space_url: str, ticket: str):
+    """Libera la plaza del ticket, o lo saca de la cola si aún esperaba."""
+    holders, queue, seen = _keys(space_url)
+    pipe = redis_client.pipeline()
+    pipe.zrem(holders, ticket)
+    pipe.zrem(queue, ticket)
+    pipe.zrem(seen, ticket)
+    pipe.execute()
+
+def free_slots(space_url: str) -> int:
+    """
+    Plazas que un job nuevo obtendría sin esperar: límite menos sesiones activas y jobs en cola.
+    Las plazas caducadas se descuentan con el reloj de Redis, igual que al adquirirlas.
+    """
+    holders, queue, _ = _keys(space_url)
+    return int(_FREE_SLOTS_SCRIPT(keys=[holders, queue], args=[get_limit(space_url)]))
+
+def _keep_alive(space_url: str, ticket: str, stop: threading.Event):
+    """Renueva la plaza mientras dura la sesión; si el worker muere, caduca tras SPACE_SLOT_TTL."""
+    holders = _keys(space_url)[0]
+    while not stop.wait(SPACE_SLOT_TTL / 3):
+        try:
+            _REFRESH_SCRIPT(keys=[holders], args=[ticket, SPACE_SLOT_TTL])
+        except Exception as e:
+            print(f"Error al renovar la plaza del Space {space_url}: {e}")
+
+@contextmanager
+def space_slot(space_url: str, ticket: str, on_queued=None, should_abandon=None,
+               timeout: float = SPACE_ADMISSION_TIMEOUT):
+    """
+    Context manager que espera turno en la cola de admisión del Space y mantiene la plaza
+    ocupada mientras dura el bloque.
+    Args:
+        on_queued (callable): Se llama con la posición en la cola cada vez que cambia.
+        should_abandon (callable): Se consulta en cada espera; si devuelve True se deja la
+            cola (p. ej. porque otra réplica tiene plazas libres).
+    Raises:
+        AdmissionAbandoned: Si should_abandon pidió dejar la cola.
+        TimeoutError: Si no se obtiene plaza en 'timeout' segundos.
+    """
+    deadline = time.monotonic() + timeout
+    last_position = None
+    try:
+        while True:
+            position = try_acquire(space_url, ticket)
+            if position == 0:
+                break
+            if position != last_position:
+                last_position = position
+                if on_queued:
+                    on_queued(position)
+            if should_abandon and should_abandon():
+                raise AdmissionAbandoned(f"Se abandona la cola de {space_url}.")
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"No se obtuvo turno en {space_url} tras {timeout} segundos en cola.")
+            time.sleep(SPACE_ADMISSION_POLL_INTERVAL)
+    except BaseException:
+        release(space_url, ticket)
+        raise
+
+    stop = threading.Event()
+    keeper = threading.Thread(target=_keep_alive, args=(space_url, ticket, stop), daemon=True)
+    keeper.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        release(space_url, ticket)
+
+def get_stats(space_url: str) -> dict:
+    holders, queue, _ = _keys(space_url)
+    return {
+        "limit": get_limit(space_url),
+        "active": redis_client.zcard(holders),
+        "queued": redis_client.zcard(queue),
+    }
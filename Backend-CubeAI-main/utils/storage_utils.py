@@ -1,17 +1,225 @@
 from config.firebase_config import bucket
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import datetime
+import httpx
+import mimetypes
 import os
+import uuid
+import threading
+
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "5"))
+# Máximo de operaciones por petición batch de Cloud Storage.
+STORAGE_BATCH_SIZE = 100
+# Tamaño de cada bloque al copiar en streaming una salida del Space al bucket (múltiplo de 256 KiB).
+STORAGE_STREAM_CHUNK_SIZE = int(os.getenv("STORAGE_STREAM_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+_upload_executor = ThreadPoolExecutor(max_workers=STORAGE_UPLOAD_WORKERS, thread_name_prefix="storage-upload")
+_session_lock = threading.Lock()
+_session_configured = False
+
+def _configure_http_session():
+    """
+    Todas las subidas comparten la sesión HTTP autenticada del cliente de Storage.
+    Se amplía su pool de conexiones para que los hilos de subida reutilicen conexiones en lugar de abrir nuevas.
+    """
+    global _session_configured
+    with _session_lock:
+        if _session_configured:
+            return
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=STORAGE_UPLOAD_WORKERS)
+        bucket.client._http.mount("https://", adapter)
+        _session_configured = True
+
+class RemoteFileGone(Exception):
+    """La salida del Space ya no está disponible en su URL (p. ej. el Space limpió su caché)."""
+
+def is_remote_file(value) -> bool:
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+def _space_headers() -> dict:
+    token = os.getenv("HF_TOKEN")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+def download_remote_file(url: str, directory: str) -> str:
+    """Descarga una salida del Space (por URL) al directorio indicado. Returns: la ruta local."""
+    name = os.path.basename(url.split("?", 1)[0]) or "output"
+    destination_path = os.path.join(directory, f"{uuid.uuid4().hex}_{name}")
+    with httpx.stream("GET", url, headers=_space_headers(), timeout=60, follow_redirects=True) as response:
+        response.raise_for_status()
+        with open(destination_path, "wb") as f:
+            for chunk in response.iter_bytes(STORAGE_STREAM_CHUNK_SIZE):
+                f.write(chunk)
+    return destination_path
+
+def stream_to_storage(url: str, destination_blob_name: str) -> str:
+    """
+    Copia una salida del Space al bucket sin pasar por disco: se lee por bloques de la URL y se
+    escribe con una subida reanudable, con memoria acotada a un bloque.
+    Raises:
+        RemoteFileGone: Si el Space ya no sirve el archivo.
+    """
+    _configure_http_session()
+    blob = bucket.blob(destination_blob_name)
+    content_type = mimetypes.guess_type(destination_blob_name)[0] or "application/octet-stream"
+    with httpx.stream("GET", url, headers=_space_headers(), timeout=60, follow_redirects=True) as response:
+        if response.status_code in (404, 410):
+            raise RemoteFileGone(f"La salida {url} ya no está disponible en el Space.")
+        response.raise_for_status()
+        with blob.open("wb", chunk_size=STORAGE_STREAM_CHUNK_SIZE, content_type=content_type,
+                       predefined_acl="publicRead") as writer:
+            for chunk in response.iter_bytes(STORAGE_STREAM_CHUNK_SIZE):
+                writer.write(chunk)
+    return blob.public_url
 
 def upload_to_storage(file_source, destination_blob_name):
+    if is_remote_file(file_source):
+        return stream_to_storage(file_source, destination_blob_name)
+    _configure_http_session()
     blob = bucket.blob(destination_blob_name)
-    
+
+    # predefined_acl publica el objeto en la misma petición de subida (sin la llamada extra de make_public).
     if isinstance(file_source, str):
         if os.path.exists(file_source):
-            blob.upload_from_filename(file_source)
+            blob.upload_from_filename(file_source, predefined_acl="publicRead")
         else:
             raise FileNotFoundError(f"El archivo local no se encontró en: {file_source}")
     else:
         file_source.seek(0)
-        blob.upload_from_file(file_source)
+        blob.upload_from_file(file_source, predefined_acl="publicRead")
+
+    return blob.public_url
+
+def submit_upload(file_source, destination_blob_name):
+    """Programa una subida en el pool de subidas y devuelve su concurrent.futures.Future."""
+    return _upload_executor.submit(upload_to_storage, file_source, destination_blob_name)
+
+def upload_artifacts(generation_folder: str, artifacts: dict) -> dict:
+    """
+    Sube en paralelo todos los artefactos de una generación.
+    Args:
+        generation_folder (str): Carpeta destino en Storage (ej. '{uid}/Imagen3D/{nombre}').
+        artifacts (dict): Nombre del archivo destino -> ruta local (ej. {'model.glb': '/tmp/x.glb'}).
+    Returns:
+        dict: Nombre del archivo destino -> URL pública.
+    """
+    futures = {
+        name: submit_upload(source, f'{generation_folder}/{name}')
+        for name, source in artifacts.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+def _copy_blob(source_name: str, destination_name: str) -> str:
+    _configure_http_session()
+    new_blob = bucket.copy_blob(bucket.blob(source_name), bucket, destination_name)
+    new_blob.make_public()
+    return new_blob.public_url
+
+def copy_artifacts(source_folder: str, generation_folder: str, names: list) -> dict:
+    """
+    Copia en el servidor (sin descargar) los artefactos de otra generación.
+    Returns:
+        dict: Nombre del archivo -> URL pública de la copia.
+    """
+    futures = {
+        name: _upload_executor.submit(_copy_blob, f'{source_folder}/{name}', f'{generation_folder}/{name}')
+        for name in names
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+def folder_size(folder: str) -> int:
+    """Bytes que ocupan en Storage los archivos de una carpeta."""
+    return sum(blob.size or 0 for blob in bucket.list_blobs(prefix=f'{folder.rstrip("/")}/'))
+
+def list_blobs_by_folder(prefix: str) -> dict:
+    """Lista una sola vez todo lo que cuelga de 'prefix' y lo agrupa por carpeta."""
+    listed = {}
+    for blob in bucket.list_blobs(prefix=prefix):
+        listed.setdefault(blob.name.rsplit("/", 1)[0], []).append(blob)
+    return listed
+
+def delete_folders(folders: list, listed: dict = None) -> dict:
+    """
+    Borra todos los archivos de varias carpetas con peticiones batch (hasta 100 borrados por petición).
+    Args:
+        folders (list): Carpetas a borrar (ej. '{uid}/Imagen3D/{nombre}').
+        listed (dict): Resultado de list_blobs_by_folder, para no listar cada carpeta por separado.
+    Returns:
+        dict: Carpeta -> bytes borrados.
+    """
+    sizes = {}
+    blobs = []
+    for folder in folders:
+        if listed is not None:
+            folder_blobs = listed.get(folder, [])
+        else:
+            folder_blobs = list(bucket.list_blobs(prefix=f'{folder}/'))
+        sizes[folder] = sum(blob.size or 0 for blob in folder_blobs)
+        blobs.extend(folder_blobs)
+
+    _delete_blobs(blobs)
+    return sizes
+
+def _delete_blobs(blobs: list):
+    _configure_http_session()
+    for start in range(0, len(blobs), STORAGE_BATCH_SIZE):
+        # raise_exception=False: un archivo ya borrado (404) no debe abortar el resto del lote.
+        with bucket.client.batch(raise_exception=False):
+            for blob in blobs[start:start + STORAGE_BATCH_SIZE]:
+                blob.delete()
+
+def delete_prefix(prefix: str) -> int:
+    """Borra con peticiones batch todos los archivos cuyo nombre empieza por 'prefix'. Returns: bytes borrados."""
+    blobs = list(bucket.list_blobs(prefix=prefix))
+    _delete_blobs(blobs)
+    return sum(blob.size or 0 for blob in blobs)
+
+def storage_ref(blob_name: str) -> str:
+    """Referencia 'gs://bucket/objeto' con la que las etapas localizan un archivo del bucket."""
+    return f"gs://{bucket.name}/{blob_name}"
+
+def is_storage_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(f"gs://{bucket.name}/")
+
+def ref_blob_name(ref: str) -> str:
+    # Sin el hash del contenido que acompaña a las subidas directas ('#md5=...').
+    return ref[len(f"gs://{bucket.name}/"):].split("#", 1)[0]
+
+def download_ref(ref: str, destination_path: str):
+    """Descarga a disco el objeto de una referencia 'gs://'."""
+    _configure_http_session()
+    bucket.blob(ref_blob_name(ref)).download_to_filename(destination_path)
+
+def create_upload_url(blob_name: str, content_type: str, max_bytes: int, expiration: int) -> dict:
+    """
+    URL firmada (v4) para que el cliente suba un objeto con PUT directamente al bucket.
+    El tipo de contenido, el rango de tamaño y el customTime van firmados: el cliente debe enviar
+    las mismas cabeceras. El customTime hace que la regla de caducidad borre las subidas abandonadas.
+    Returns:
+        dict: {'upload_url': ..., 'headers': {...}}
+    """
+    headers = {
+        "Content-Type": content_type,
+        "x-goog-content-length-range": f"0,{max_bytes}",
+        "x-goog-custom-time": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    upload_url = bucket.blob(blob_name).generate_signed_url(
+        version="v4",
+        expiration=datetime.timedelta(seconds=expiration),
+        method="PUT",
+        content_type=content_type,
+        headers={name: value for name, value in headers.items() if name != "Content-Type"},
+    )
+    return {"upload_url": upload_url, "headers": headers}
 
-    blob.make_public()
-    return blob.public_url
\ No newline at end of file
+def ensure_custom_time_expiry(days: int):
+    """
+    Añade al bucket una regla de ciclo de vida que borra los objetos cuyo customTime tiene más
+    de 'days' días (entradas del staging y subidas directas), si no tiene ya una.
+    """
+    bucket.reload()
+    for rule in bucket.lifecycle_rules:
+        if rule.get("action", {}).get("type") == "Delete" and "daysSinceCustomTime" in rule.get("condition", {}):
+            return
+    bucket.add_lifecycle_delete_rule(days_since_custom_time=days)
+    bucket.patch()
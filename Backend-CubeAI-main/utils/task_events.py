@@ -0,0 +1,16 @@
+from config.socketio_config import get_emitter
+
+TASK_STATUS_EVENT = "task_status"
+
+def publish_task_status(task_id: str, payload: dict):
+    """
+    Envía el estado de una generación a los clientes suscritos a su task_id.
+    El payload tiene la misma forma que la respuesta de /generation_status.
+    Un fallo al publicar no debe interrumpir la generación: el cliente puede consultar el estado.
+    """
+    if not task_id:
+        return
+    try:
+        get_emitter().emit(TASK_STATUS_EVENT, dict(payload, task_id=task_id), to=task_id)
+    except Exception as e:
+        print(f"Error al publicar el estado de la tarea {task_id}: {e}")
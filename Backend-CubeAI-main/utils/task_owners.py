@@ -0,0 +1,21 @@
+from config.redis_config import redis_client
+import os
+
+# Usuario dueño de cada tarea que el frontend sigue por su task_id (generaciones, borrados masivos
+# y borrado de cuenta), para que el canal push y /generation_status solo expongan las propias.
+TASK_OWNER_TTL = int(os.getenv("TASK_OWNER_TTL", str(7 * 24 * 3600)))
+
+_KEY_PREFIX = "task-owner:"
+
+def record_owner(task_id: str, user_uid: str):
+    redis_client.set(_KEY_PREFIX + task_id, user_uid, ex=TASK_OWNER_TTL)
+
+def is_owner(task_id: str, user_uid: str) -> bool:
+    return bool(task_id) and bool(user_uid) and redis_client.get(_KEY_PREFIX + task_id) == user_uid
+
+def owned_task_ids(task_ids: list, user_uid: str) -> list:
+    """Los task_ids de la lista que pertenecen al usuario, en el mismo orden."""
+    if not task_ids:
+        return []
+    owners = redis_client.mget([_KEY_PREFIX + task_id for task_id in task_ids])
+    return [task_id for task_id, owner in zip(task_ids, owners) if owner == user_uid]
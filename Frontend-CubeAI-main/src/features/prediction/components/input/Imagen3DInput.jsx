@@ -48,6 +48,7 @@ export const Imagen3DInput = ({ isCollapsed }) => {
     setSubmissionError,
     taskId,
     taskStatus,
+    isTaskActive,
     taskData,
     resetTaskState,
   } = usePredictionHandler(user);
@@ -130,14 +131,14 @@ export const Imagen3DInput = ({ isCollapsed }) => {
     [user, prediction_img3d_result]
   );
 
-  const isUIBlocked = isSubmitting || (taskId && (taskStatus === "PENDING" || taskStatus === "PROCESSING"));
+  const isUIBlocked = isSubmitting || (taskId && isTaskActive);
 
   const isButtonDisabled =
     isUIBlocked ||
     !generationName.trim() ||
     !imageFile;
 
-  const showPollingStatus = taskId && (taskStatus === "PENDING" || taskStatus === "PROCESSING");
+  const showPollingStatus = taskId && isTaskActive;
   const showSuccessUI = taskStatus === "SUCCESS";
   const showFailureUI = taskStatus === "FAILURE" && submissionError;
 
@@ -247,6 +248,16 @@ export const Imagen3DInput = ({ isCollapsed }) => {
                 {showPollingStatus && (
                   <div className="text-center p-2 bg-blue-500/10 dark:bg-blue-400/20 rounded-lg text-sm text-blue-700 dark:text-blue-300">
                     {t("generation_pages.common.status_generating")} (Status: {taskStatus}) {t("generation_pages.common.please_wait")}
+                    {taskData?.previewUrl && (
+                      <video
+                        src={taskData.previewUrl}
+                        autoPlay
+                        loop
+                        muted
+                        playsInline
+                        className="mx-auto mt-2 max-w-full max-h-48 rounded-md"
+                      />
+                    )}
                   </div>
                 )}
                 {showSuccessUI && (
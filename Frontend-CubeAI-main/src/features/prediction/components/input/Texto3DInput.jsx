@@ -52,6 +52,7 @@ export const Texto3DInput = ({ isCollapsed }) => {
     setError: setSubmissionError,   // Renamed
     taskId,
     taskStatus,
+    isTaskActive,
     taskData,
     resetTaskState,
   } = usePredictionHandler(user);
@@ -144,12 +145,12 @@ export const Texto3DInput = ({ isCollapsed }) => {
 
   const isGenerateButtonDisabled =
     isSubmitting ||
-    (taskId && (taskStatus === "PENDING" || taskStatus === "PROCESSING")) ||
+    (taskId && isTaskActive) ||
     !generationName.trim() ||
     !userPrompt.trim() ||
     !selectedStyle;
 
-  const showPollingStatus = taskId && (taskStatus === "PENDING" || taskStatus === "PROCESSING");
+  const showPollingStatus = taskId && isTaskActive;
   const showSuccessUI = taskStatus === "SUCCESS";
   const showFailureUI = taskStatus === "FAILURE" && submissionError; // submissionError will contain the error message
 
@@ -285,6 +286,16 @@ export const Texto3DInput = ({ isCollapsed }) => {
                 {showPollingStatus && (
                   <div className="text-center p-2 bg-blue-500/10 dark:bg-blue-400/20 rounded-lg text-sm text-blue-700 dark:text-blue-300">
                     {t("generation_pages.common.status_generating")} (Status: {taskStatus}) {t("generation_pages.common.please_wait")}
+                    {taskData?.previewUrl && (
+                      <video
+                        src={taskData.previewUrl}
+                        autoPlay
+                        loop
+                        muted
+                        playsInline
+                        className="mx-auto mt-2 max-w-full max-h-48 rounded-md"
+                      />
+                    )}
                   </div>
                 )}
 
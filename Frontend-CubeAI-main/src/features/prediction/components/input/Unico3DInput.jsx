@@ -48,6 +48,7 @@ export const Unico3DInput = ({ isCollapsed }) => {
     setSubmissionError,
     taskId,
     taskStatus,
+    isTaskActive,
     taskData,
     resetTaskState,
   } = usePredictionHandler(user);
@@ -130,14 +131,14 @@ export const Unico3DInput = ({ isCollapsed }) => {
     [user, prediction_unico3d_result]
   );
 
-  const isUIBlocked = isSubmitting || (taskId && (taskStatus === "PENDING" || taskStatus === "PROCESSING"));
+  const isUIBlocked = isSubmitting || (taskId && isTaskActive);
 
   const isButtonDisabled =
     isUIBlocked ||
     !generationName.trim() ||
     !imageFile;
 
-  const showPollingStatus = taskId && (taskStatus === "PENDING" || taskStatus === "PROCESSING");
+  const showPollingStatus = taskId && isTaskActive;
   const showSuccessUI = taskStatus === "SUCCESS";
   const showFailureUI = taskStatus === "FAILURE" && submissionError;
 
@@ -4,9 +4,11 @@ import { GenerationCard } from "./GenerationCard";
 import { DeleteConfirmationModal } from "../../../../components/modals/DeleteConfirmationModal";
 import { SuccessModal } from "../../../../components/modals/SuccessModal";
 import { LoadingModal } from "../../../../components/modals/LoadingModal";
-import { getGenerations, deleteGeneration } from "../../services/predictionApi";
+import { getGenerationsPage, deleteGeneration } from "../../services/predictionApi";
 import { useTranslation } from "react-i18next";
 
+const PAGE_SIZE = 20;
+
 export const PredictionHistory = ({ selectedTab, open3DViewer }) => {
   const { t } = useTranslation();
   const [generations, setGenerations] = useState([]);
@@ -16,7 +18,10 @@ export const PredictionHistory = ({ selectedTab, open3DViewer }) => {
   const [showSuccessModal, setShowSuccessModal] = useState(false);
   const [deleteLoading, setDeleteLoading] = useState(false);
   const [generationToDelete, setGenerationToDelete] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
+  // The backend returns the generations already sorted by timestamp, newest first
   const fetchGenerations = useCallback(async () => {
     setIsLoading(true);
     setApiError(null);
@@ -24,13 +29,12 @@ export const PredictionHistory = ({ selectedTab, open3DViewer }) => {
       const user = auth.currentUser;
       if (user) {
         const token = await user.getIdToken();
-        const data = await getGenerations(token, selectedTab);
-        const sortedGenerations = data.sort(
-          (a, b) => new Date(b.timestamp) - new Date(a.timestamp)
-        );
-        setGenerations(sortedGenerations);
+        const page = await getGenerationsPage(token, selectedTab, { limit: PAGE_SIZE });
+        setGenerations(page.items);
+        setNextCursor(page.next_cursor);
       } else {
         setGenerations([]);
+        setNextCursor(null);
       }
     } catch (error) {
       console.error(`Error fetching ${selectedTab} generations:`, error);
@@ -38,11 +42,30 @@ export const PredictionHistory = ({ selectedTab, open3DViewer }) => {
         `${t('visualizer_page.history.error_prefix')}${selectedTab}.`
       );
       setGenerations([]);
+      setNextCursor(null);
     } finally {
       setIsLoading(false);
     }
   }, [selectedTab, t]);
 
+  const loadMoreGenerations = async () => {
+    if (!nextCursor || !auth.currentUser) return;
+    setIsLoadingMore(true);
+    try {
+      const token = await auth.currentUser.getIdToken();
+      const page = await getGenerationsPage(token, selectedTab, { limit: PAGE_SIZE, startAfter: nextCursor });
+      setGenerations((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error(`Error fetching more ${selectedTab} generations:`, error);
+      setApiError(
+        `${t('visualizer_page.history.error_prefix')}${selectedTab}.`
+      );
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchGenerations();
   }, [fetchGenerations]);
@@ -139,6 +162,18 @@ export const PredictionHistory = ({ selectedTab, open3DViewer }) => {
         </div>
       )}
 
+      {!isLoading && nextCursor && (
+        <div className="flex justify-center my-6">
+          <button
+            onClick={loadMoreGenerations}
+            disabled={isLoadingMore}
+            className="px-6 py-2 rounded-lg text-sm font-semibold text-white bg-gradient-to-r from-azul-gradient to-morado-gradient disabled:opacity-60 disabled:cursor-not-allowed"
+          >
+            {isLoadingMore ? t('visualizer_page.history.loading_more') : t('visualizer_page.history.load_more')}
+          </button>
+        </div>
+      )}
+
       <DeleteConfirmationModal
         showModal={showDeleteModal}
         closeModal={closeDeleteModal}
@@ -7,10 +7,16 @@ import {
   generateUnico3D,
   generateMultiImagen3D,
   getTaskStatus, // Import the new function
+  subscribeToTaskStatus,
 } from "../services/predictionApi";
 import { useTranslation } from "react-i18next";
 import { useEffect } from "react";
 
+// Intermediate stages published by the backend, in order
+const PROGRESS_STATUSES = ["PREPROCESSED", "SAMPLED_3D", "GLB_EXTRACTED", "UPLOADED"];
+// Statuses in which the task can still change (IN_PROGRESS is Celery's STARTED)
+const ACTIVE_TASK_STATUSES = ["PENDING", "QUEUED", "PROCESSING", "IN_PROGRESS", ...PROGRESS_STATUSES];
+
 export const usePredictionHandler = (user) => {
   const { t } = useTranslation();
 
@@ -18,7 +24,7 @@ export const usePredictionHandler = (user) => {
   const [submissionError, setSubmissionError] = useState(null); // Renamed from error
   const [loadingSteps, setLoadingSteps] = useState([]);
   const [taskId, setTaskId] = useState(null);
-  const [taskStatus, setTaskStatus] = useState(null); // e.g., PENDING, PROCESSING, SUCCESS, FAILURE
+  const [taskStatus, setTaskStatus] = useState(null); // e.g., PENDING, QUEUED, PROCESSING, SUCCESS, FAILURE
   const [taskData, setTaskData] = useState(null); // To store data from successful/failed task
 
   const submitPrediction = useCallback(
@@ -52,7 +58,7 @@ export const usePredictionHandler = (user) => {
       }
       
       try {
-        const token = await user.getIdToken(true);
+        const token = await user.getIdToken();
         const responseData = await predictionFunction(token, payload);
 
         if (responseData && responseData.task_id) {
@@ -79,7 +85,74 @@ export const usePredictionHandler = (user) => {
     [user, t, setIsSubmitting, setSubmissionError]
   );
 
-  // Polling effect for task status
+  const applyTaskStatus = useCallback(
+    (result) => {
+      // e.g. result = { status: "SUCCESS", result: {...} } or { status: "QUEUED", queue_position: 2 }
+      if (!result || !result.status) {
+        console.warn("Unexpected status response:", result);
+        setSubmissionError(t("errors.unexpected_polling_response") || "Received an unexpected response from the server during polling.");
+        return;
+      }
+
+      setTaskStatus(result.status);
+
+      if (result.status === "SUCCESS") {
+        setTaskData(result.result !== undefined ? result.result : result.data !== undefined ? result.data : result);
+      } else if (result.status === "FAILURE") {
+        const errorMessage = result.error || result.message || t("errors.task_failed_processing") || "Task failed during processing.";
+        setSubmissionError(errorMessage);
+        setTaskData(result.result !== undefined ? result.result : {
+          error: result.error,
+          message: result.message,
+          traceback: result.traceback
+        });
+      } else if (result.status === "QUEUED") {
+        // Waiting for a free slot in the generation Space
+        setTaskData({ queuePosition: result.queue_position });
+      } else if (result.status === "PROCESSING" || PROGRESS_STATUSES.includes(result.status)) {
+        // Keep the preview once it has been published by an earlier stage
+        setTaskData((prev) => ({
+          stage: result.stage || result.status,
+          previewUrl: result.preview_url || prev?.previewUrl,
+        }));
+      } else if (result.status === "PENDING") {
+        // If backend provides intermediate data during PENDING
+        if (result.data !== undefined) {
+          setTaskData(result.data);
+        } else if (result.result !== undefined) { // Or if it's in result.result
+          setTaskData(result.result);
+        }
+      }
+    },
+    [t, setSubmissionError]
+  );
+
+  const isTaskActive = ACTIVE_TASK_STATUSES.includes(taskStatus);
+  const [pushConnected, setPushConnected] = useState(false);
+
+  // Push channel: status changes arrive as soon as the backend produces them
+  useEffect(() => {
+    if (!taskId || !user || !isTaskActive) return;
+
+    let unsubscribe = null;
+    let cancelled = false;
+
+    user.getIdToken().then((token) => {
+      if (cancelled) return;
+      unsubscribe = subscribeToTaskStatus(token, taskId, {
+        onStatus: applyTaskStatus,
+        onConnectionChange: setPushConnected,
+      });
+    }).catch((err) => console.error("Push channel error:", err));
+
+    return () => {
+      cancelled = true;
+      setPushConnected(false);
+      if (unsubscribe) unsubscribe();
+    };
+  }, [taskId, user, isTaskActive, applyTaskStatus]);
+
+  // Polling fallback, only while the push channel is not connected
   useEffect(() => {
     let intervalId;
 
@@ -87,44 +160,9 @@ export const usePredictionHandler = (user) => {
       if (!taskId || !user) return; // Ensure user is available for token fetching
 
       try {
-        const token = await user.getIdToken(true);
+        const token = await user.getIdToken();
         const result = await getTaskStatus(token, taskId);
-
-        // Assuming result directly contains status and potentially other data
-        // e.g., result = { status: "SUCCESS", data: {...} } or result = { status: "PROCESSING" }
-        if (result && result.status) {
-          setTaskStatus(result.status);
-
-          if (result.status === "SUCCESS") {
-            setTaskData(result.result !== undefined ? result.result : result.data !== undefined ? result.data : result);
-            // Optionally clear submissionError on success if desired:
-            // setSubmissionError(null);
-          } else if (result.status === "FAILURE") {
-            const errorMessage = result.error || result.message || t("errors.task_failed_processing") || "Task failed during processing.";
-            setSubmissionError(errorMessage);
-            setTaskData(result.result !== undefined ? result.result : {
-              error: result.error,
-              message: result.message,
-              traceback: result.traceback
-            });
-          } else if (result.status === "PENDING" || result.status === "PROCESSING") {
-            // If backend provides intermediate data during PENDING/PROCESSING states
-            if (result.data !== undefined) {
-              setTaskData(result.data);
-            } else if (result.result !== undefined) { // Or if it's in result.result
-              setTaskData(result.result);
-            }
-          }
-
-          if (result.status === "SUCCESS" || result.status === "FAILURE") {
-            clearInterval(intervalId);
-          }
-        } else {
-          console.warn("Unexpected status response during polling:", result);
-          setSubmissionError(t("errors.unexpected_polling_response") || "Received an unexpected response from the server during polling.");
-          // setTaskStatus("FAILURE"); // Consider if this is appropriate, might stop further polls if backend is temporarily unresponsive
-        }
-
+        applyTaskStatus(result);
       } catch (pollingError) {
         console.error("Polling error:", pollingError);
         setSubmissionError(pollingError.message || t("errors.fetching_task_status") || "Error fetching task status.");
@@ -134,14 +172,14 @@ export const usePredictionHandler = (user) => {
       }
     };
 
-    if (taskId && user && (taskStatus === "PENDING" || taskStatus === "PROCESSING")) {
+    if (taskId && user && isTaskActive && !pushConnected) {
       intervalId = setInterval(fetchTaskStatus, 5000); // Poll every 5 seconds
     }
 
     return () => {
       clearInterval(intervalId);
     };
-  }, [taskId, taskStatus, user, setSubmissionError, t]); // setError -> setSubmissionError
+  }, [taskId, user, isTaskActive, pushConnected, applyTaskStatus, setSubmissionError, t]);
 
   const clearSubmissionError = useCallback(() => { // Renamed from clearError
     setSubmissionError(null);
@@ -165,6 +203,7 @@ export const usePredictionHandler = (user) => {
     taskId,
     taskStatus,
     taskData,
+    isTaskActive,
     resetTaskState, // Added
   };
 };
\ No newline at end of file
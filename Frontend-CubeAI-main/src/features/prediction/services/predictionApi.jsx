@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { io } from 'socket.io-client';
 
 const BASE_URL = import.meta.env.VITE_BASE_URL;
 
@@ -8,15 +9,55 @@ const handleApiError = (error, defaultMessage = "Error en la solicitud de predic
   throw new Error(message);
 };
 
-export const generateBoceto3D = async (token, formData) => {
+// Image inputs go straight to the bucket through signed upload URLs and the generation is
+// submitted with the object references. If the direct upload cannot be used (e.g. the bucket
+// has no CORS rule for this origin), the form is sent as multipart like before.
+const uploadFormFiles = async (token, formData) => {
+  const files = [...formData.entries()].filter(([, value]) => value instanceof File);
+  const { data } = await axios.post(
+    `${BASE_URL}/generation/upload_urls`,
+    { content_types: files.map(([, file]) => file.type) },
+    { headers: { Authorization: `Bearer ${token}` } }
+  );
+  await Promise.all(
+    data.uploads.map((upload, index) =>
+      axios.put(upload.upload_url, files[index][1], { headers: upload.headers })
+    )
+  );
+
+  const body = { uploads: {} };
+  formData.forEach((value, key) => {
+    if (!(value instanceof File)) body[key] = value;
+  });
+  files.forEach(([key], index) => {
+    body.uploads[key] = data.uploads[index].object_name;
+  });
+  return body;
+};
+
+const postGenerationForm = async (path, token, formData) => {
+  let body;
   try {
-    const response = await axios.post(`${BASE_URL}/boceto3D`, formData, {
+    body = await uploadFormFiles(token, formData);
+  } catch (error) {
+    console.warn("Direct upload unavailable, sending multipart form:", error);
+    const response = await axios.post(`${BASE_URL}${path}`, formData, {
       headers: {
-        "Content-Type": "multipart/form-data", 
+        "Content-Type": "multipart/form-data",
         Authorization: `Bearer ${token}`,
       },
     });
-    return response.data; 
+    return response.data;
+  }
+  const response = await axios.post(`${BASE_URL}${path}`, body, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  return response.data;
+};
+
+export const generateBoceto3D = async (token, formData) => {
+  try {
+    return await postGenerationForm("/boceto3D", token, formData);
   } catch (error) {
     handleApiError(error, "Error al generar desde boceto"); 
   }
@@ -24,13 +65,7 @@ export const generateBoceto3D = async (token, formData) => {
 
 export const generateImagen3D = async (token, formData) => {
   try {
-    const response = await axios.post(`${BASE_URL}/imagen3D`, formData, {
-      headers: {
-        "Content-Type": "multipart/form-data",
-        Authorization: `Bearer ${token}`,
-      },
-    });
-    return response.data;
+    return await postGenerationForm("/imagen3D", token, formData);
   } catch (error) {
     handleApiError(error, "Error al generar desde imagen");
   }
@@ -60,13 +95,7 @@ export const generateTextImg3D = async (token, data) => {
 
 export const generateUnico3D = async (token, formData) => {
     try {
-        const response = await axios.post(`${BASE_URL}/unico3D`, formData, {
-            headers: {
-                "Content-Type": "multipart/form-data",
-                Authorization: `Bearer ${token}`,
-            },
-        });
-        return response.data;
+        return await postGenerationForm("/unico3D", token, formData);
     } catch (error) {
         handleApiError(error, "Error al generar desde único");
     }
@@ -74,13 +103,7 @@ export const generateUnico3D = async (token, formData) => {
 
 export const generateMultiImagen3D = async (token, formData) => {
     try {
-        const response = await axios.post(`${BASE_URL}/multiimagen3D`, formData, {
-            headers: {
-                "Content-Type": "multipart/form-data",
-                Authorization: `Bearer ${token}`,
-            },
-        });
-        return response.data;
+        return await postGenerationForm("/multiimagen3D", token, formData);
     } catch (error) {
         handleApiError(error, "Error al generar desde multi-imagen");
     }
@@ -101,6 +124,56 @@ export const getGenerations = async (token, generationType) => {
   }
 };
 
+// One page of a user's generations, newest first, with only the fields the history cards need
+export const getGenerationsPage = async (token, generationType, { limit = 20, startAfter = null } = {}) => {
+  try {
+    const params = { type: generationType, view: "card", limit };
+    if (startAfter) params.start_after = startAfter;
+    const response = await axios.get(`${BASE_URL}/generations`, {
+      params,
+      headers: { Authorization: `Bearer ${token}` },
+    });
+
+    if (!response.data || !Array.isArray(response.data.items)) {
+        throw new Error("La respuesta de la API no es una página válida.");
+    }
+    return response.data;
+  } catch (error) {
+    handleApiError(error, `Error al obtener el historial para ${generationType}`);
+  }
+};
+
+// One page of the merged feed of all generation types, newest first
+export const getGenerationsFeed = async (token, { limit = 20, cursor = null } = {}) => {
+  try {
+    const params = { view: "card", limit };
+    if (cursor) params.cursor = cursor;
+    const response = await axios.get(`${BASE_URL}/generations/feed`, {
+      params,
+      headers: { Authorization: `Bearer ${token}` },
+    });
+
+    if (!response.data || !Array.isArray(response.data.items)) {
+        throw new Error("La respuesta de la API no es una página válida.");
+    }
+    return response.data;
+  } catch (error) {
+    handleApiError(error, "Error al obtener el historial de generaciones");
+  }
+};
+
+// Per-user dashboard summary: counts per type, most recent generations and storage bytes
+export const getGenerationsSummary = async (token) => {
+  try {
+    const response = await axios.get(`${BASE_URL}/generations/summary`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    return response.data;
+  } catch (error) {
+    handleApiError(error, "Error al obtener el resumen de generaciones");
+  }
+};
+
 export const deleteGeneration = async (token, generation) => {
   try {
     if (!generation || !generation.prediction_type || !generation.generation_name) {
@@ -123,6 +196,21 @@ export const deleteGeneration = async (token, generation) => {
   }
 };
 
+// Bulk deletion: `generations` are { generation_name, prediction_type } items and `types`
+// empties whole generation types. Large deletions answer 202 with a task_id to follow.
+export const bulkDeleteGenerations = async (token, { generations = [], types = [] }) => {
+  try {
+    const response = await axios.post(
+      `${BASE_URL}/generations/bulk_delete`,
+      { generations, types },
+      { headers: { Authorization: `Bearer ${token}` } }
+    );
+    return response.data;
+  } catch (error) {
+    handleApiError(error, "Error al eliminar las generaciones");
+  }
+};
+
 export const uploadPredictionPreview = async (token, formData) => {
   try {
     const response = await axios.post(`${BASE_URL}/generation/preview`, formData, {
@@ -148,4 +236,24 @@ export const getTaskStatus = async (token, taskId) => {
   } catch (error) {
     handleApiError(error, "Error al obtener el estado de la tarea");
   }
-};
\ No newline at end of file
+};
+// Push channel for task status: the backend emits every state change of the task
+// (same shape as /generation_status). Websocket-only so it works across backend workers.
+export const subscribeToTaskStatus = (token, taskId, { onStatus, onConnectionChange }) => {
+  const socket = io(BASE_URL, { transports: ["websocket"], auth: { token } });
+
+  socket.on("connect", () => {
+    onConnectionChange?.(true);
+    socket.emit("subscribe", { task_id: taskId });
+  });
+  socket.on("disconnect", () => onConnectionChange?.(false));
+  socket.on("connect_error", () => onConnectionChange?.(false));
+  socket.on("task_status", (result) => {
+    if (result?.task_id === taskId) onStatus(result);
+  });
+
+  return () => {
+    socket.emit("unsubscribe", { task_id: taskId });
+    socket.disconnect();
+  };
+};